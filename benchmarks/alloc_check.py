@@ -0,0 +1,125 @@
+"""Steady-state allocation check for the portal and adafruit_httpserver on CPython
+
+Uses `tracemalloc` to measure the bytes allocated while handling one HID report
+of each kind, during one idle `HTTPServer.poll()` and while streaming the blocks
+of every toy as JSON with `json_stream.JSONStream`. Allocations retained after
+a run (leaks) and the transient peak per iteration are both checked.
+
+Usage::
+
+    python benchmarks/alloc_check.py --max-report-bytes 512 --max-poll-bytes 1024
+
+Exits with status 1 if any measurement exceeds its limit.
+"""
+
+import argparse
+import os
+import socket
+import sys
+import tempfile
+import tracemalloc
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "lib"))
+sys.path.insert(0, os.path.join(ROOT, "host"))
+
+# pylint: disable=wrong-import-position
+from adafruit_httpserver.server import HTTPServer
+from json_stream import Hex, JSONStream
+from portal import Portal
+
+
+def _report(*values) -> bytes:
+    return bytes(values) + bytes(Portal.REPORT_LENGTH - len(values))
+
+
+REPORTS = {
+    "activate": _report(ord("A"), 0x01),
+    "status": _report(ord("S")),
+    "query": _report(ord("Q"), 0x10, 0x08),
+    "write": _report(ord("W"), 0x10, 0x08, *range(16)),
+    "reset": _report(ord("R")),
+    "color": _report(ord("C"), 0xFF, 0x00, 0x00),
+}
+
+
+def measure(step, iterations: int):
+    """Returns ``(peak_per_iteration, retained)`` in bytes for calling ``step`` repeatedly."""
+    for _ in range(16):
+        step()
+    peak = 0
+    before = tracemalloc.get_traced_memory()[0]
+    for _ in range(iterations):
+        current = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        step()
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - current)
+    return peak, tracemalloc.get_traced_memory()[0] - before
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--max-report-bytes", type=int, default=512)
+    parser.add_argument("--max-write-bytes", type=int, default=16384, help="W includes the save")
+    parser.add_argument("--max-poll-bytes", type=int, default=1024)
+    parser.add_argument("--max-json-bytes", type=int, default=4096, help="independent of toys")
+    parser.add_argument("--max-retained-bytes", type=int, default=4096)
+    args = parser.parse_args(argv)
+
+    failures = []
+
+    def check(name: str, peak: int, retained: int, limit: int) -> None:
+        print(f"{name:>10}: peak {peak:>6} B/iteration  retained {retained:>6} B")
+        if peak > limit:
+            failures.append(f"{name}: peak {peak} B > {limit} B")
+        if retained > args.max_retained_bytes:
+            failures.append(f"{name}: retained {retained} B > {args.max_retained_bytes} B")
+
+    with tempfile.TemporaryDirectory() as toy_dir:
+        Portal.DEFAULT_TOY_PATH = os.path.join(toy_dir, "toy_{}.dump")
+        for index in range(Portal.MAX_TOYS):
+            with open(Portal.DEFAULT_TOY_PATH.format(index + 1), "wb") as file:
+                file.write(bytes(1024))
+
+        device = Portal.get_hid_device()
+        portal = Portal([device])
+
+        tracemalloc.start()
+        for name, report in REPORTS.items():
+
+            def step(report=report):
+                device.receive(report)
+                portal.process_reports()
+
+            limit = args.max_write_bytes if name == "write" else args.max_report_bytes
+            check(name, *measure(step, args.iterations), limit)
+
+        stream = JSONStream(512)
+
+        def stream_toys():
+            toys = (
+                {
+                    "path": toy.path,
+                    "blocks": (Hex(toy.read_block(i)) for i in range(len(toy.data) // 16)),
+                }
+                for toy in portal.slots.toys
+            )
+            for _ in stream.chunks(toys):
+                pass
+
+        check("toy json", *measure(stream_toys, args.iterations // 10), args.max_json_bytes)
+
+        server = HTTPServer(socket)
+        server.start("127.0.0.1", 0)
+        check("idle poll", *measure(server.poll, args.iterations), args.max_poll_bytes)
+        tracemalloc.stop()
+
+    for failure in failures:
+        print("FAIL", failure)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
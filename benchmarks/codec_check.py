@@ -0,0 +1,166 @@
+"""Known-answer and cache check for `toy_codec.ToyCodec` on CPython
+
+Builds a toy with a fixed header and two data areas encrypted with the
+``aesio`` stand-in in ``host/`` (itself checked against the FIPS-197 vectors)
+and checks that:
+
+* CRC-16, the header checksum and the key of a block match known values,
+* a known encrypted block decrypts to its known plain text,
+* every data block round-trips and the decoded figure, XP, gold and nickname
+  are right,
+* each block is decrypted once, until `Toy.write_block` invalidates it, and
+  writing the header invalidates every block.
+
+Usage::
+
+    python benchmarks/codec_check.py
+
+Exits with status 1 if any check fails.
+"""
+
+import hashlib
+import os
+import struct
+import sys
+import tempfile
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "lib"))
+sys.path.insert(0, os.path.join(ROOT, "host"))
+
+# pylint: disable=wrong-import-position
+import aesio
+import toy_codec
+from portal import Toy
+from toy_codec import BLOCK_SIZE, KEY_SUFFIX, ToyCodec, crc16, header_valid
+
+# FIPS-197 appendix C: plain text, then key and cipher text for AES-128, -192 and -256
+AES_PLAIN = bytes.fromhex("00112233445566778899aabbccddeeff")
+AES_VECTORS = (
+    (bytes(range(16)), "69c4e0d86a7b0430d8cdb78070b4c55a"),
+    (bytes(range(24)), "dda97ca4864cdfe06eaf70a0ec0d7191"),
+    (bytes(range(32)), "8ea2b7ca516745bfeafc49904b496089"),
+)
+# the toy built by make_toy
+HEADER_CRC = 0xF7A1
+BLOCK_8_KEY = "650434a982fa17a5eb48ac2f1250f225"
+BLOCK_8_CIPHER = "96aae400e9f9ca8afc631940d2c02cf5"
+BLOCK_8_PLAIN = "e80300c8000000000005000000009f38"  # XP 1000, gold 200, sequence 5
+
+
+def area_block(xp: int, gold: int, sequence: int) -> bytes:
+    """The first block of a data area, with its checksum."""
+    block = bytearray(BLOCK_SIZE)
+    block[0:3] = xp.to_bytes(3, "little")
+    struct.pack_into("<H", block, 0x03, gold)
+    block[0x09] = sequence
+    struct.pack_into("<H", block, 0x0E, crc16(bytes(block[0:0x0E]) + b"\x05\x00"))
+    return bytes(block)
+
+
+def nickname_blocks(name: str) -> bytes:
+    return name.encode("utf-16-le").ljust(2 * BLOCK_SIZE, b"\x00")
+
+
+def make_toy(path: str) -> dict:
+    """Write an encrypted dump to ``path``, returns its plain data blocks by index."""
+    data = bytearray(0x40 * BLOCK_SIZE)
+    data[0:BLOCK_SIZE] = bytes(range(0x20, 0x30))
+    struct.pack_into("<H", data, 0x10, 0x0123)  # figure id
+    struct.pack_into("<H", data, 0x1C, 0x3000)  # variant
+    struct.pack_into("<H", data, 0x1E, crc16(data[0:0x1E]))
+    plain = {
+        0x08: area_block(1000, 200, 5),
+        0x24: area_block(2500, 750, 6),  # the newer area
+    }
+    name = nickname_blocks("Spyro")
+    plain[0x26], plain[0x28] = name[:BLOCK_SIZE], name[BLOCK_SIZE:]
+    plain[0x0A] = bytes(range(0xF0, 0x100))
+    header_md5 = hashlib.md5(bytes(data[0 : 2 * BLOCK_SIZE]))
+    for index, block in plain.items():
+        md5 = header_md5.copy()
+        md5.update(bytes((index,)) + KEY_SUFFIX)
+        out = bytearray(BLOCK_SIZE)
+        aesio.AES(md5.digest(), aesio.MODE_ECB).encrypt_into(block, out)
+        data[index * BLOCK_SIZE : (index + 1) * BLOCK_SIZE] = out
+    with open(path, "wb") as file:
+        file.write(data)
+    return plain
+
+
+def main() -> int:
+    failures = []
+
+    def check(name: str, passed: bool) -> None:
+        print(f"{'ok' if passed else 'FAIL':>4} {name}")
+        if not passed:
+            failures.append(name)
+
+    for key, cipher in AES_VECTORS:
+        out = bytearray(BLOCK_SIZE)
+        aesio.AES(key, aesio.MODE_ECB).encrypt_into(AES_PLAIN, out)
+        check(f"AES-{len(key) * 8} encrypts the FIPS-197 vector", out.hex() == cipher)
+        aesio.AES(key, aesio.MODE_ECB).decrypt_into(bytes(out), out)
+        check(f"AES-{len(key) * 8} decrypts the FIPS-197 vector", out == AES_PLAIN)
+    check("CRC-16/CCITT-FALSE of 123456789", crc16(b"123456789") == 0x29B1)
+
+    decrypted = []
+    decrypt_block = toy_codec._decrypt_block  # pylint: disable=protected-access
+
+    def counting_decrypt(key, block, out):
+        decrypted.append(bytes(block))
+        decrypt_block(key, block, out)
+
+    toy_codec._decrypt_block = counting_decrypt  # pylint: disable=protected-access
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "toy.dump")
+        plain = make_toy(path)
+        toy = Toy(path)
+        codec = ToyCodec(toy)
+
+        check("header checksum", header_valid(toy.data[0 : 2 * BLOCK_SIZE])
+              and struct.unpack_from("<H", toy.data, 0x1E)[0] == HEADER_CRC)
+        check("key of block 8", codec.block_key(0x08).hex() == BLOCK_8_KEY)
+        check("known cipher text of block 8", bytes(toy.read_block(0x08)).hex() == BLOCK_8_CIPHER)
+        check("known plain text of block 8", codec.decoded_block(0x08).hex() == BLOCK_8_PLAIN)
+        blocks = codec.decode_all()
+        check("every data block round-trips",
+              all(blocks[index] == block for index, block in plain.items()))
+        check("unencrypted blocks are passed through",
+              blocks[0] == bytes(toy.read_block(0)) and blocks[3] == bytes(toy.read_block(3)))
+        check("checksums verify", codec.verify() == [])
+        summary = codec.summary()
+        check("decoded summary", summary == {
+            "figure_id": 0x0123, "variant": 0x3000, "xp": 2500, "gold": 750,
+            "nickname": "Spyro", "valid": True,
+        })
+        check("each block is decrypted once", len(decrypted) == len(plain))
+
+        decrypted.clear()
+        cipher = bytes(toy.read_block(0x0A))
+        toy.write_block(0x0A, bytes(reversed(cipher)))
+        check("a written block is decrypted again", codec.decoded_block(0x0A) != plain[0x0A]
+              and len(decrypted) == 1)
+        toy.write_block(0x0A, cipher)
+        check("only the written block is invalidated",
+              codec.decoded_block(0x0A) == plain[0x0A] and codec.decoded_block(0x08) == plain[0x08]
+              and len(decrypted) == 2)
+
+        decrypted.clear()
+        header = bytes(toy.read_block(0))
+        toy.write_block(0, bytes(BLOCK_SIZE))
+        check("writing the header invalidates every key and block",
+              codec.decoded_block(0x08) != plain[0x08] and codec.verify() != [])
+        toy.write_block(0, header)
+        check("the restored header decodes again",
+              codec.decoded_block(0x08) == plain[0x08] and codec.verify() == [])
+        codec.close()
+        check("close stops observing the toy", codec not in toy.observers)
+    toy_codec._decrypt_block = decrypt_block  # pylint: disable=protected-access
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
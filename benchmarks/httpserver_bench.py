@@ -0,0 +1,435 @@
+"""Load-testing benchmark for adafruit_httpserver on CPython
+
+Starts `HTTPServer` on loopback in a child process (with the CPython `socket`
+module as socket source) and drives it with concurrent clients.
+
+Usage::
+
+    python benchmarks/httpserver_bench.py --clients 8 --requests 2000
+    python benchmarks/httpserver_bench.py --scenario mixed --output results.json
+    python benchmarks/httpserver_bench.py --baseline old.json --tolerance 0.15
+    python benchmarks/httpserver_bench.py --scenario cpu --workers 1 --workers 2 --workers 4
+    python benchmarks/httpserver_bench.py --scenario io --executor 8
+    python benchmarks/httpserver_bench.py --scenario static --bundle
+
+``--workers`` runs that many server processes sharing the port with ``SO_REUSEPORT``
+(given several times, every scenario runs with each count), ``--executor`` runs route
+handlers on a thread pool of that size, ``--bundle`` serves the static files from an
+`HTTPBundle` instead of the file system, opened once before the workers fork. The bodies
+of static files are checked, a wrong or short one counts as an error.
+
+Exits with status 1 if ``--baseline`` is given and a scenario regressed.
+"""
+
+import argparse
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import socket
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib"))
+
+# pylint: disable=wrong-import-position
+from adafruit_httpserver.bundle import HTTPBundle, write_bundle
+from adafruit_httpserver.methods import HTTPMethod
+from adafruit_httpserver.response import HTTPResponse
+from adafruit_httpserver.server import HTTPServer
+
+HOST = "127.0.0.1"
+
+STATIC_SIZES = {
+    "/static_1k.bin": 1024,
+    "/static_16k.bin": 16 * 1024,
+    "/static_256k.bin": 256 * 1024,
+}
+# contents of the static files, the same in every process
+STATIC_DATA = {path: random.Random(path).randbytes(size) for path, size in STATIC_SIZES.items()}
+
+SCENARIOS = {
+    "get": {"get": 1},
+    "static": {"static": 1},
+    "post": {"post": 1},
+    "slow": {"get": 3, "slow": 1},
+    "mixed": {"get": 6, "static": 2, "post": 2},
+    "cpu": {"cpu": 1},
+    "io": {"io": 1},
+}
+
+KINDS = ("get", "static", "post", "slow", "cpu", "io")
+
+# pure Python work per /work request, about a millisecond
+CPU_ROUNDS = 20000
+# simulated storage latency per /io request, in seconds
+IO_DELAY = 0.005
+
+
+class _CountingSocket:
+    """Wraps the listening socket so the server process can count accepted connections."""
+
+    def __init__(self, sock):
+        self._sock = sock
+        self.accepted = 0
+
+    def accept(self):
+        conn = self._sock.accept()
+        self.accepted += 1
+        return conn
+
+    def __getattr__(self, name):
+        return getattr(self._sock, name)
+
+
+def _serve(  # pylint: disable=too-many-arguments
+    port_pipe,
+    stop_event,
+    root_path: str,
+    trace_alloc: bool,
+    port: int,
+    reuse_port: bool,
+    executor: int,
+    bundle,
+) -> None:
+    """
+    Server process: runs ``poll()`` until stopped, then reports its own measurements.
+    ``bundle`` is an `HTTPBundle` opened before the fork, the path of one or ``""``.
+    """
+    server = HTTPServer(socket)
+    if bundle:
+        server.bundle = HTTPBundle(bundle) if isinstance(bundle, str) else bundle
+    if executor:
+        server.executor = concurrent.futures.ThreadPoolExecutor(max_workers=executor)
+        trace_alloc = False  # allocations of the handler threads can't be told apart
+
+    @server.route("/")
+    def small(request):  # pylint: disable=unused-argument
+        return HTTPResponse(body="Hello World")
+
+    @server.route("/echo", HTTPMethod.POST)
+    def echo(request):
+        return HTTPResponse(body=str(len(request.body)))
+
+    @server.route("/work")
+    def work(request):  # pylint: disable=unused-argument
+        value = 0
+        for index in range(CPU_ROUNDS):
+            value = (value * 31 + index) & 0xFFFF
+        return HTTPResponse(body=str(value))
+
+    @server.route("/io")
+    def io(request):  # pylint: disable=unused-argument,invalid-name
+        time.sleep(IO_DELAY)
+        return HTTPResponse(body="done")
+
+    server.start(HOST, port, root_path, reuse_port=reuse_port)
+    if reuse_port:
+        # like hosting.run_worker, wait in accept() so idle workers leave the cores to busy ones
+        server._sock.settimeout(0.05)  # pylint: disable=protected-access
+    server._sock = _CountingSocket(server._sock)  # pylint: disable=protected-access
+    port_pipe.send(server._sock.getsockname()[1])  # pylint: disable=protected-access
+
+    allocations = []
+    if trace_alloc:
+        tracemalloc.start()
+    while not stop_event.is_set():
+        accepted = server._sock.accepted  # pylint: disable=protected-access
+        if trace_alloc:
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        try:
+            server.poll()
+        except OSError:
+            continue
+        if trace_alloc and server._sock.accepted != accepted:  # pylint: disable=protected-access
+            allocations.append(tracemalloc.get_traced_memory()[1] - before)
+    if server.executor is not None:
+        server.executor.shutdown(wait=True)
+
+    port_pipe.send(
+        {
+            "served": server._sock.accepted,  # pylint: disable=protected-access
+            "allocations": allocations,
+            "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        }
+    )
+
+
+def _build_request(kind: str, rng: random.Random, post_size: int):
+    """Returns ``(request_bytes, slow, expected_body)`` for a request of the given kind."""
+    if kind == "static":
+        path = rng.choice(list(STATIC_SIZES))
+        return f"GET {path} HTTP/1.1\r\nHost: bench\r\n\r\n".encode(), False, STATIC_DATA[path]
+    if kind == "post":
+        body = b"x" * post_size
+        head = (
+            "POST /echo HTTP/1.1\r\nHost: bench\r\n"
+            f"Content-Type: application/octet-stream\r\nContent-Length: {len(body)}\r\n\r\n"
+        )
+        return head.encode() + body, False, None
+    if kind == "cpu":
+        return b"GET /work HTTP/1.1\r\nHost: bench\r\n\r\n", False, None
+    if kind == "io":
+        return b"GET /io HTTP/1.1\r\nHost: bench\r\n\r\n", False, None
+    return b"GET / HTTP/1.1\r\nHost: bench\r\n\r\n", kind == "slow", None
+
+
+def _request(  # pylint: disable=too-many-arguments
+    port: int, payload: bytes, slow: bool, slow_delay: float, expected: bytes = None
+) -> int:
+    """
+    Sends one request and reads the response until the server closes. Returns bytes read,
+    raises `OSError` for a connection error, a request shed with 503 or a body other
+    than ``expected``.
+    """
+    with socket.create_connection((HOST, port), timeout=30) as sock:
+        if slow:
+            for offset in range(0, len(payload), 4):
+                sock.sendall(payload[offset : offset + 4])
+                time.sleep(slow_delay)
+        else:
+            sock.sendall(payload)
+        received = 0
+        status = b""
+        response = bytearray() if expected is not None else None
+        while chunk := sock.recv(65536):
+            if not received:
+                status = chunk[9:12]
+            received += len(chunk)
+            if response is not None:
+                response += chunk
+    if not received:
+        raise OSError("empty response")
+    if status == b"503":
+        raise OSError("shed with 503")
+    if response is not None and response[response.find(b"\r\n\r\n") + 4 :] != expected:
+        raise OSError("wrong body")
+    return received
+
+
+def _client(port, kinds, count, args, seed, latencies, errors, lock) -> None:
+    rng = random.Random(seed)
+    local_latencies = []
+    local_errors = 0
+    for _ in range(count):
+        payload, slow, expected = _build_request(rng.choice(kinds), rng, args.post_size)
+        start = time.perf_counter()
+        try:
+            _request(port, payload, slow, args.slow_delay, expected)
+            local_latencies.append(time.perf_counter() - start)
+        except OSError:
+            local_errors += 1
+    with lock:
+        latencies.extend(local_latencies)
+        errors[0] += local_errors
+
+
+def _percentile(values, fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run_scenario(  # pylint: disable=too-many-locals,too-many-arguments
+    name: str, mix: dict, args, root_path: str, workers: int = 1, bundle_path: str = ""
+) -> dict:
+    """Runs one scenario against fresh server processes and returns its measurements."""
+    stop_event = multiprocessing.Event()
+    bundle = bundle_path
+    if bundle_path and multiprocessing.get_start_method() == "fork":
+        bundle = HTTPBundle(bundle_path)  # shared by the workers like with serve_prefork
+    port = 0
+    pipes = []
+    processes = []
+    for _ in range(workers):
+        parent_pipe, child_pipe = multiprocessing.Pipe()
+        process = multiprocessing.Process(
+            target=_serve,
+            args=(
+                child_pipe,
+                stop_event,
+                root_path,
+                not args.no_tracemalloc,
+                port,
+                workers > 1,
+                args.executor,
+                bundle,
+            ),
+        )
+        process.start()
+        port = parent_pipe.recv()  # the first worker picks the port, the others share it
+        pipes.append(parent_pipe)
+        processes.append(process)
+
+    kinds = [kind for kind, weight in mix.items() for _ in range(weight)]
+    per_client = max(1, args.requests // args.clients)
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    threads = [
+        threading.Thread(
+            target=_client,
+            args=(port, kinds, per_client, args, args.seed + index, latencies, errors, lock),
+        )
+        for index in range(args.clients)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    stop_event.set()
+    server_stats = [pipe.recv() for pipe in pipes]
+    for process in processes:
+        process.join()
+    if isinstance(bundle, HTTPBundle):
+        bundle.close()
+
+    allocations = [size for stats in server_stats for size in stats["allocations"]]
+    return {
+        "scenario": name,
+        "mix": mix,
+        "workers": workers,
+        "executor": args.executor,
+        "bundle": bool(bundle_path),
+        "requests": len(latencies),
+        "errors": errors[0],
+        "elapsed_s": round(elapsed, 4),
+        "requests_per_sec": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(_percentile(latencies, 0.50) * 1000, 3),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 3),
+        "alloc_bytes_per_request": {
+            "mean": round(sum(allocations) / len(allocations), 1) if allocations else None,
+            "max": max(allocations) if allocations else None,
+        },
+        "served_per_worker": [stats["served"] for stats in server_stats],
+        "peak_rss_kb": max(stats["peak_rss_kb"] for stats in server_stats),
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Returns a list of human readable regressions of ``results`` against ``baseline``."""
+    regressions = []
+    previous = {entry["scenario"]: entry for entry in baseline.get("scenarios", [])}
+    for entry in results["scenarios"]:
+        old = previous.get(entry["scenario"])
+        if old is None:
+            continue
+        name = entry["scenario"]
+        if entry["requests_per_sec"] < old["requests_per_sec"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: requests/sec {old['requests_per_sec']} -> {entry['requests_per_sec']}"
+            )
+        if entry["p99_ms"] > old["p99_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p99 {old['p99_ms']} ms -> {entry['p99_ms']} ms")
+        old_alloc = old["alloc_bytes_per_request"]["mean"]
+        new_alloc = entry["alloc_bytes_per_request"]["mean"]
+        if old_alloc and new_alloc and new_alloc > old_alloc * (1 + tolerance):
+            regressions.append(f"{name}: bytes/request {old_alloc} -> {new_alloc}")
+    return regressions
+
+
+def _parse_mix(text: str) -> dict:
+    mix = {}
+    for part in text.split(","):
+        kind, weight = part.split(":")
+        if kind not in KINDS:
+            raise argparse.ArgumentTypeError(f"unknown request kind {kind!r}")
+        mix[kind] = int(weight)
+    return mix
+
+
+def _print_entry(label: str, entry: dict) -> None:
+    print(
+        f"{label:>8}: {entry['requests_per_sec']:>9.1f} req/s  "
+        f"p50 {entry['p50_ms']:>8.3f} ms  p99 {entry['p99_ms']:>8.3f} ms  "
+        f"alloc {entry['alloc_bytes_per_request']['mean']} B/req  "
+        f"rss {entry['peak_rss_kb']} KiB  errors {entry['errors']}"
+    )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=4, help="concurrent clients")
+    parser.add_argument("--requests", type=int, default=1000, help="requests per scenario")
+    parser.add_argument(
+        "--scenario", action="append", choices=sorted(SCENARIOS), help="scenario(s) to run"
+    )
+    parser.add_argument("--mix", type=_parse_mix, help="custom mix, e.g. get:6,static:2,post:2")
+    parser.add_argument("--post-size", type=int, default=512, help="POST body size in bytes")
+    parser.add_argument("--slow-delay", type=float, default=0.01, help="seconds between slow sends")
+    parser.add_argument(
+        "--workers", type=int, action="append", help="server processes sharing the port"
+    )
+    parser.add_argument("--executor", type=int, default=0, help="handler threads per server")
+    parser.add_argument(
+        "--bundle", action="store_true", help="serve the static files from an HTTPBundle"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-tracemalloc", action="store_true", help="skip allocation tracing")
+    parser.add_argument("--output", help="write JSON results to this file")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed relative regression")
+    args = parser.parse_args(argv)
+
+    scenarios = {name: SCENARIOS[name] for name in args.scenario or ["get", "static", "post", "mixed"]}
+    if args.mix:
+        scenarios["custom"] = args.mix
+
+    results = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "clients": args.clients,
+            "requests": args.requests,
+            "tracemalloc": not args.no_tracemalloc,
+            "executor": args.executor,
+            "bundle": args.bundle,
+            "cpu_count": os.cpu_count(),
+        },
+        "scenarios": [],
+    }
+    with tempfile.TemporaryDirectory() as root_path:
+        assets = []
+        for path, size in STATIC_SIZES.items():
+            data = STATIC_DATA[path]
+            with open(root_path + path, "wb") as file:
+                file.write(data)
+            assets.append((path, data, "application/octet-stream", None, f'"{size}"'))
+        bundle_path = ""
+        if args.bundle:
+            bundle_path = os.path.join(root_path, "static.bundle")
+            write_bundle(bundle_path, assets)
+        worker_counts = args.workers or [1]
+        for name, mix in scenarios.items():
+            for workers in worker_counts:
+                label = name if worker_counts == [1] else f"{name}/{workers}w"
+                entry = run_scenario(label, mix, args, root_path, workers, bundle_path)
+                results["scenarios"].append(entry)
+                _print_entry(label, entry)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        for regression in regressions:
+            print("REGRESSION", regression)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
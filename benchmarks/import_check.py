@@ -0,0 +1,230 @@
+"""Archive check for `toy_import.ToyImporter` on CPython
+
+Builds tar and zip packs with `tarfile` and `zipfile` and feeds them to the
+importer whole, in odd sized chunks and a byte at a time, and checks that:
+
+* ustar, GNU long name and pax tar entries are imported under their base name,
+* stored, deflated and streamed (data descriptor) zip entries are imported,
+* dumps with a wrong size, CRC or header checksum are rejected, other files
+  are skipped,
+* truncated archives are reported as incomplete,
+* malformed archives, e.g. a pax header without a length, raise ValueError
+  instead of hanging.
+
+Usage::
+
+    python benchmarks/import_check.py
+
+Exits with status 1 if any check fails.
+"""
+
+import io
+import os
+import signal
+import struct
+import sys
+import tarfile
+import zipfile
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "host"))
+
+# pylint: disable=wrong-import-position
+from toy_codec import crc16
+from toy_import import DUMP_SIZE, ToyImporter, _pax_path
+
+CHUNK_SIZES = (None, 7, 1)  # the whole archive, odd chunks, a byte at a time
+TIMEOUT = 5  # seconds a single import may take before it counts as hung
+LONG_DIRECTORY = "packs/" + "a-very-long-directory-name/" * 5  # more than 100 characters
+
+
+class Library:
+    """Keeps imported dumps in memory"""
+
+    def __init__(self) -> None:
+        self.toys = {}
+
+    def save_toy(self, name: str, data: bytes) -> None:
+        self.toys[name] = bytes(data)
+
+
+def dump(seed: int) -> bytes:
+    """A dump with a valid header checksum."""
+    data = bytearray((seed * 31 + index) & 0xFF for index in range(DUMP_SIZE))
+    struct.pack_into("<H", data, 0x1E, crc16(data[0:0x1E]))
+    return bytes(data)
+
+
+def bad_header(seed: int) -> bytes:
+    data = bytearray(dump(seed))
+    data[0x1E] ^= 0xFF
+    return bytes(data)
+
+
+def make_tar(entries, tar_format=tarfile.USTAR_FORMAT) -> bytes:
+    out = io.BytesIO()
+    with tarfile.open(fileobj=out, mode="w", format=tar_format) as tar:
+        for name, data in entries:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    return out.getvalue()
+
+
+class _Unseekable(io.RawIOBase):
+    """Makes `zipfile` stream entries with data descriptors"""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.data = bytearray()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.data += data
+        return len(data)
+
+
+def make_zip(entries, compression=zipfile.ZIP_STORED, streamed=False) -> bytes:
+    out = _Unseekable() if streamed else io.BytesIO()
+    with zipfile.ZipFile(out, "w", compression) as archive:
+        for name, data in entries:
+            if streamed:
+                with archive.open(name, "w") as entry:
+                    entry.write(data)
+            else:
+                archive.writestr(name, data)
+    return bytes(out.data) if streamed else out.getvalue()
+
+
+def pax_header(data: bytes) -> bytes:
+    """A pax extended header block with ``data`` as its records, padded to 512 bytes."""
+    info = tarfile.TarInfo("././@PaxHeader")
+    info.type = tarfile.XHDTYPE
+    info.size = len(data)
+    return info.tobuf(tarfile.USTAR_FORMAT) + data + bytes(-len(data) % 512)
+
+
+def bad_signature(archive: bytes) -> bytes:
+    """``archive`` with the signature of its second local header broken."""
+    second = archive.index(b"PK\x03\x04", 4)
+    return archive[:second] + b"PK\x09\x09" + archive[second + 4 :]
+
+
+def run(archive: bytes, chunk_size):
+    """Imports ``archive``, returns the result and the library, or the exception raised."""
+    library = Library()
+    importer = ToyImporter(library)
+    signal.alarm(TIMEOUT)
+    try:
+        if chunk_size is None:
+            importer.feed(archive)
+        else:
+            for offset in range(0, len(archive), chunk_size):
+                importer.feed(archive[offset : offset + chunk_size])
+        return importer.close(), library
+    except (ValueError, TimeoutError) as error:
+        return error, library
+    finally:
+        signal.alarm(0)
+
+
+def _timeout(_signum, _frame):
+    raise TimeoutError("the import hung")
+
+
+def main() -> int:
+    failures = []
+
+    def check(name: str, passed: bool) -> None:
+        print(f"{'ok' if passed else 'FAIL':>4} {name}")
+        if not passed:
+            failures.append(name)
+
+    signal.signal(signal.SIGALRM, _timeout)
+    toys = {f"toy{seed}": dump(seed) for seed in range(3)}
+    valid = [(f"{name}.dump", data) for name, data in toys.items()] + [("README.txt", b"hi")]
+    archives = {
+        "ustar tar": make_tar(valid),
+        "GNU long name tar": make_tar(
+            [(LONG_DIRECTORY + name, data) for name, data in valid], tarfile.GNU_FORMAT
+        ),
+        "pax tar": make_tar(
+            [(LONG_DIRECTORY + name, data) for name, data in valid], tarfile.PAX_FORMAT
+        ),
+        "stored zip": make_zip(valid),
+        "deflated zip": make_zip(valid, zipfile.ZIP_DEFLATED),
+        "streamed deflated zip": make_zip(valid, zipfile.ZIP_DEFLATED, streamed=True),
+    }
+    for kind, archive in archives.items():
+        for chunk_size in CHUNK_SIZES:
+            result, library = run(archive, chunk_size)
+            check(
+                f"{kind} in chunks of {chunk_size or 'all'}",
+                isinstance(result, dict)
+                and result["complete"]
+                and sorted(result["imported"]) == sorted(toys)
+                and not result["rejected"]
+                and result["skipped"] == 1
+                and library.toys == toys,
+            )
+
+    rejects = [
+        ("short.dump", dump(4)[:-16]),
+        ("header.dump", bad_header(5)),
+        ("good.dump", dump(6)),
+    ]
+    for kind, archive in (("tar", make_tar(rejects)), ("zip", make_zip(rejects))):
+        result, library = run(archive, 7)
+        check(
+            f"{kind} rejects wrong sizes and header checksums",
+            isinstance(result, dict)
+            and result["rejected"]
+            == [{"name": "short", "reason": "size"}, {"name": "header", "reason": "header"}]
+            and list(library.toys) == ["good"],
+        )
+    archive = bytearray(make_zip([("crc.dump", dump(7))]))
+    archive[30 + len("crc.dump") + 100] ^= 0xFF  # stored data, the CRC no longer matches
+    result, _ = run(bytes(archive), 7)
+    check("zip rejects a wrong CRC", isinstance(result, dict)
+          and result["rejected"] == [{"name": "crc", "reason": "crc"}])
+
+    for kind, archive in (("tar", archives["ustar tar"]), ("zip", archives["stored zip"])):
+        result, library = run(archive[:1024], 7)  # in the middle of the first dump
+        check(f"truncated {kind} is incomplete", isinstance(result, dict)
+              and not result["complete"] and result["rejected"][-1]["reason"] == "truncated")
+
+    signal.alarm(TIMEOUT)
+    try:
+        _pax_path(b"abc")
+        check("pax records without a space raise ValueError", False)
+    except ValueError:
+        check("pax records without a space raise ValueError", True)
+    except TimeoutError:
+        check("pax records without a space raise ValueError", False)
+    finally:
+        signal.alarm(0)
+    check("pax path of a valid record", _pax_path(b"12 path=a/b\n") == "a/b")
+    garbage = pax_header(b"garbage\n") + make_tar(valid)
+    for chunk_size in CHUNK_SIZES:
+        result, _ = run(garbage, chunk_size)
+        check(f"tar with a garbage pax header raises ValueError, chunks of {chunk_size or 'all'}",
+              isinstance(result, ValueError))
+    for kind, archive in (
+        ("pax length past its header", pax_header(b"99 path=x\n") + make_tar(valid)),
+        ("random bytes", bytes(range(256)) * 4),
+        ("tar with a bad checksum", b"x" * 512),
+        ("zip with a bad entry signature", bad_signature(make_zip(valid))),
+        ("streamed zip with corrupt deflate data",
+         archives["streamed deflated zip"][:40] + b"\xff" * 64 + bytes(600)),
+    ):
+        result, _ = run(archive, 7)
+        check(f"{kind} raises ValueError", isinstance(result, ValueError))
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""Portal protocol over loopback, using `transport.NetworkTransport` on CPython
+
+Runs a `Portal` on a `NetworkTransport` in a background thread and plays the
+emulator: sends batches of ``Q`` (query) frames over UDP and TCP, checks every
+reply against the toy dumps and reports round trips and frames per second.
+
+Usage::
+
+    python benchmarks/portal_loopback_bench.py --duration 2 --batch 1 --batch 8
+"""
+
+import argparse
+import os
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "host"))
+
+# pylint: disable=wrong-import-position
+from portal import Portal
+from transport import NetworkTransport
+
+HOST = "127.0.0.1"
+FRAME = Portal.REPORT_LENGTH
+
+
+def _serve(portal: Portal, stop: threading.Event) -> None:
+    while not stop.is_set():
+        portal.process_reports()
+
+
+def _recv_frames(sock, protocol: str, count: int) -> bytes:
+    data = b""
+    while len(data) < count * FRAME:
+        data += sock.recv(65536)
+        if protocol == NetworkTransport.UDP:
+            break
+    return data
+
+
+def run(protocol: str, batch: int, low_latency: bool, args, dumps) -> dict:
+    """Runs one protocol/batch combination and returns its measurements."""
+    transport = NetworkTransport(socket, HOST, 0, protocol, low_latency=low_latency)
+    portal = Portal(transport=transport)
+    stop = threading.Event()
+    thread = threading.Thread(target=_serve, args=(portal, stop))
+    thread.start()
+
+    kind = socket.SOCK_DGRAM if protocol == NetworkTransport.UDP else socket.SOCK_STREAM
+    sock = socket.socket(socket.AF_INET, kind)
+    sock.settimeout(5)
+    sock.connect((HOST, transport.port))
+    if low_latency and protocol == NetworkTransport.TCP:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    rng = random.Random(args.seed)
+    round_trips = 0
+    errors = 0
+    deadline = time.perf_counter() + args.duration
+    start = time.perf_counter()
+    while time.perf_counter() < deadline:
+        queries = [(rng.randrange(Portal.MAX_TOYS), rng.randrange(64)) for _ in range(batch)]
+        sock.sendall(
+            b"".join(
+                bytes((ord("Q"), 0x10 + slot, block)) + bytes(FRAME - 3) for slot, block in queries
+            )
+        )
+        try:
+            replies = _recv_frames(sock, protocol, batch)
+        except OSError:
+            errors += batch
+            continue
+        for index, (slot, block) in enumerate(queries):
+            reply = replies[index * FRAME : (index + 1) * FRAME]
+            if reply[3:19] != dumps[slot][block * 16 : block * 16 + 16]:
+                errors += 1
+        round_trips += 1
+    elapsed = time.perf_counter() - start
+
+    sock.close()
+    stop.set()
+    thread.join()
+    transport.close()
+    return {
+        "round_trips_per_sec": round_trips / elapsed,
+        "frames_per_sec": round_trips * batch / elapsed,
+        "errors": errors,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--duration", type=float, default=1.0, help="seconds per combination")
+    parser.add_argument("--batch", type=int, action="append", help="frames per packet")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    failed = False
+    with tempfile.TemporaryDirectory() as toy_dir:
+        Portal.DEFAULT_TOY_PATH = os.path.join(toy_dir, "toy_{}.dump")
+        dumps = [os.urandom(1024) for _ in range(Portal.MAX_TOYS)]
+        for index, dump in enumerate(dumps):
+            with open(Portal.DEFAULT_TOY_PATH.format(index + 1), "wb") as file:
+                file.write(dump)
+
+        for protocol in (NetworkTransport.UDP, NetworkTransport.TCP):
+            for batch in args.batch or [1, 8]:
+                for low_latency in (False, True):
+                    result = run(protocol, batch, low_latency, args, dumps)
+                    failed = failed or result["errors"] > 0
+                    print(
+                        f"{protocol} batch {batch:>2} low_latency {low_latency!s:>5}: "
+                        f"{result['round_trips_per_sec']:>9.1f} round trips/s  "
+                        f"{result['frames_per_sec']:>9.1f} frames/s  errors {result['errors']}"
+                    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
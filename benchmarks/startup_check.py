@@ -0,0 +1,124 @@
+"""Startup ordering check for code.py's main loop on CPython
+
+Runs the portal, `WiFiManager` and `HTTPServer` against the stand-ins in
+``host/`` with a slow, flaky simulated Wi-Fi, and checks that:
+
+* the first HID report is answered before the first Wi-Fi attempt (when the
+  console reports before ``--start-delay``),
+* the HTTP server only starts once an address is available,
+* the HTTP server is stopped and restarted when the connection drops.
+
+Usage::
+
+    python benchmarks/startup_check.py --connect-delay 0.5 --failures 3
+
+Exits with status 1 if any check fails.
+"""
+
+import argparse
+import os
+import socket
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "lib"))
+sys.path.insert(0, os.path.join(ROOT, "host"))
+
+# pylint: disable=wrong-import-position
+import usb_hid
+import wifi
+from adafruit_httpserver.server import HTTPServer
+from portal import Portal
+from wifi_manager import WiFiManager
+
+
+def main(argv=None) -> int:  # pylint: disable=too-many-locals
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--connect-delay", type=float, default=0.3)
+    parser.add_argument("--failures", type=int, default=2)
+    parser.add_argument("--start-delay", type=float, default=5)
+    parser.add_argument("--report-after", type=float, default=0.05, help="first console report")
+    parser.add_argument("--run-time", type=float, default=10)
+    args = parser.parse_args(argv)
+
+    wifi.radio.connect_delay = args.connect_delay
+    wifi.radio.failures = args.failures
+    usb_hid.enable((Portal.get_hid_device(),))
+    device = usb_hid.devices[0]
+
+    events = {}
+    server = HTTPServer(socket)
+
+    def mark(name: str) -> None:
+        events.setdefault(name, time.monotonic() - start)
+
+    def on_connect(address: str) -> None:
+        mark("server_started" if "server_stopped" not in events else "server_restarted")
+        server.start(address, 0)
+
+    def on_disconnect() -> None:
+        mark("server_stopped")
+        server.stop()
+
+    def connect(*args, **kwargs) -> None:
+        mark("first_attempt")
+        radio_connect(*args, **kwargs)
+
+    radio_connect = wifi.radio.connect
+    wifi.radio.connect = connect
+    device.on_send = lambda report: mark("first_report")
+
+    with tempfile.TemporaryDirectory() as toy_dir:
+        Portal.DEFAULT_TOY_PATH = os.path.join(toy_dir, "toy_{}.dump")
+        for index in range(Portal.MAX_TOYS):
+            with open(Portal.DEFAULT_TOY_PATH.format(index + 1), "wb") as file:
+                file.write(bytes(1024))
+
+        start = time.monotonic()
+        portal = Portal(usb_hid.devices)
+        network = WiFiManager(wifi.radio, "ssid", "password",
+                              on_connect=on_connect, on_disconnect=on_disconnect)
+        network.start(args.start_delay)
+        while time.monotonic() - start < args.run_time:
+            now = time.monotonic() - start
+            if now >= args.report_after and "report_queued" not in events:
+                mark("report_queued")
+                device.receive(bytes((ord("R"),)) + bytes(Portal.REPORT_LENGTH - 1))
+            if "server_started" in events and "server_stopped" not in events:
+                wifi.radio.disconnect()
+            if portal.process_reports():
+                network.start()
+            if network.is_connected:
+                server.poll()
+            network.poll()
+            if "server_restarted" in events and "first_report" in events:
+                break
+        server.stop()
+
+    for name, at in sorted(events.items(), key=lambda item: item[1]):
+        print(f"{name:>16}: {at * 1000:9.1f} ms")
+    print(f"{'attempts':>16}: {wifi.radio.attempts}")
+    if "first_report" in events:
+        latency = events["first_report"] - events["report_queued"]
+        print(f"{'first report in':>16}: {latency * 1000:9.1f} ms")
+
+    failures = []
+    if "first_report" not in events:
+        failures.append("no HID report was answered")
+    elif (args.report_after < args.start_delay
+          and events.get("first_attempt", float("inf")) < events["first_report"]):
+        failures.append("Wi-Fi was attempted before the first HID report was answered")
+    if "server_started" not in events:
+        failures.append("the HTTP server never started")
+    if "server_restarted" not in events:
+        failures.append("the HTTP server was not restarted after reconnecting")
+    for failure in failures:
+        print("FAIL", failure)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
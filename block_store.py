@@ -0,0 +1,294 @@
+try:
+    from typing import List, Optional
+except ImportError:
+    pass
+
+try:
+    from zlib import crc32
+except ImportError:
+    try:
+        from binascii import crc32
+    except ImportError:
+        crc32 = None
+
+from array import array
+from errno import ENOSPC
+import os
+import struct
+
+from portal import Toy
+
+BLOCK_SIZE = 0x10
+MAX_BLOCKS = 0xFFFF # block numbers are stored as u16
+MIN_INDEX_SIZE = 0x100
+
+class StoredToy(Toy):
+    """A `portal.Toy` assembled from a `BlockStore` and saved back into it
+    """
+
+    __slots__ = ("store", "name")
+
+    def __init__(self, store: "BlockStore", name: str, data: bytearray): # pylint: disable=super-init-not-called
+        self.needs_saving = False
+        self.store = store
+        self.name = name
+        self.path = store.toy_path(name)
+        self.observers = []
+        self.data = data
+        self._view = memoryview(self.data)
+
+    def save(self):
+        for observer in self.observers:
+            observer.toy_saving()
+        self.store.save_toy(self.name, self.data)
+
+class BlockStore:
+    """Content addressed, deduplicated storage for a toy library
+
+    Every distinct 16 byte block is appended once to ``blocks.bin`` and found again by
+    the CRC of its content. A toy is a ``.ref`` file with one u16 block number per
+    block, so sector trailers, zeroed areas and duplicate figures cost 2 bytes a block.
+
+    Both are kept in a generation directory, ``root/0`` at first. `compact` writes the
+    next generation next to it and switches to it with one rename, so a store that was
+    interrupted anywhere opens with either the old or the new generation. A save that
+    finds the store full compacts it first.
+
+    The index is an open addressing table of block numbers with 8 bits of the CRC of
+    each block, 3 to 6 bytes a block, and candidates are compared with the file.
+    """
+
+    def __init__(self, root: str = "/library"):
+        self.root = root
+        self.generation = 0
+        self.blocks_path = ""
+        self.table = array('H') # block number + 1, 0 is free
+        self.tags = bytearray()
+        self.count = 0
+        self.__open()
+
+    def ref_path(self, name: str) -> str:
+        return "{}/{}.ref".format(self.__directory(), BlockStore.__file_name(name))
+
+    def toy_path(self, name: str) -> str:
+        """The path of a stored toy that stays the same when the store is compacted,
+        snapshots of the toy are kept there.
+        """
+        return "{}/{}.ref".format(self.root, BlockStore.__file_name(name))
+
+    def names(self) -> List[str]:
+        return [entry[:-4] for entry in os.listdir(self.__directory()) if entry.endswith(".ref")]
+
+    def has(self, name: str) -> bool:
+        try:
+            os.stat(self.ref_path(name))
+            return True
+        except OSError:
+            return False
+
+    def remove(self, name: str):
+        """Forget a toy, its blocks stay until `compact`.
+        """
+        os.remove(self.ref_path(name))
+
+    def import_dump(self, name: str, path: str):
+        """Store the dump file at ``path`` as ``name``.
+        """
+        with open(path, 'rb') as fp:
+            self.save_toy(name, fp.read())
+
+    def load_toy(self, name: str) -> StoredToy:
+        """Assemble a toy, reading its blocks straight into the toy's buffer.
+        """
+        refs = self.__read_refs(name)
+        data = bytearray(len(refs) * BLOCK_SIZE)
+        view = memoryview(data)
+        with open(self.blocks_path, 'rb') as fp:
+            position = 0
+            while position < len(refs):
+                # consecutive block numbers are read with one call
+                run = 1
+                while position + run < len(refs) and refs[position + run] == refs[position] + run:
+                    run += 1
+                fp.seek(refs[position] * BLOCK_SIZE)
+                fp.readinto(view[position * BLOCK_SIZE:(position + run) * BLOCK_SIZE])
+                position += run
+        return StoredToy(self, name, data)
+
+    def save_toy(self, name: str, data: bytes):
+        """Store ``data`` as ``name``, only blocks not in the store yet are written.
+
+        A full store is compacted and the save tried once more, if the blocks still
+        don't fit ``OSError(ENOSPC)`` is raised and the stored toy is left as it was.
+        """
+        if len(data) % BLOCK_SIZE:
+            raise ValueError("Dump size must be a multiple of {} bytes".format(BLOCK_SIZE))
+        refs = self.__append_blocks(data)
+        if refs is None:
+            self.compact() # drops the blocks this save appended too, nothing refers to them
+            refs = self.__append_blocks(data)
+            if refs is None:
+                raise OSError(ENOSPC, "Block store is full")
+        with open(self.ref_path(name), 'wb') as fp:
+            fp.write(struct.pack('<{}H'.format(len(refs)), *refs))
+
+    def find(self, block: bytes) -> Optional[int]:
+        """Block number of ``block`` in the store, or None.
+        """
+        if not self.count:
+            return None
+        with open(self.blocks_path, 'rb') as reader:
+            return self.__find(block, reader)
+
+    def compact(self):
+        """Write a new generation with only the blocks some toy still refers to.
+        """
+        names = self.names()
+        used = bytearray(self.count)
+        for name in names:
+            for number in self.__read_refs(name):
+                used[number] = 1
+        renumber = array('H', bytearray(2 * self.count))
+        directory = "{}/{}".format(self.root, self.generation + 1)
+        temp_path = directory + ".tmp"
+        os.mkdir(temp_path)
+        with open(self.blocks_path, 'rb') as source, open(temp_path + "/blocks.bin", 'wb') as target:
+            block = bytearray(BLOCK_SIZE)
+            kept = 0
+            for number in range(self.count):
+                source.readinto(block)
+                if used[number]:
+                    target.write(block)
+                    renumber[number] = kept
+                    kept += 1
+        for name in names:
+            refs = self.__read_refs(name)
+            with open("{}/{}.ref".format(temp_path, name), 'wb') as fp:
+                fp.write(struct.pack('<{}H'.format(len(refs)), *[renumber[number] for number in refs]))
+        os.rename(temp_path, directory) # the switch, a crash before it leaves the old generation
+        previous = self.__directory()
+        self.generation += 1
+        self.blocks_path = directory + "/blocks.bin"
+        BlockStore.__remove_directory(previous)
+        self.__build_index(0)
+
+    def __directory(self) -> str:
+        return "{}/{}".format(self.root, self.generation)
+
+    @staticmethod
+    def __file_name(name: str) -> str:
+        return name.strip("/").replace("/", "_")
+
+    def __append_blocks(self, data: bytes) -> Optional[list]:
+        """Block numbers of the blocks of ``data``, appending the new ones, None if the
+        store is full.
+        """
+        self.__reserve(len(data) // BLOCK_SIZE)
+        view = memoryview(data)
+        refs = []
+        added = {} # not flushed yet, so not found in the file
+        with open(self.blocks_path, 'ab') as writer, open(self.blocks_path, 'rb') as reader:
+            for offset in range(0, len(data), BLOCK_SIZE):
+                block = bytes(view[offset:offset + BLOCK_SIZE])
+                number = added.get(block)
+                if number is None:
+                    number = self.__find(block, reader)
+                if number is None:
+                    if self.count == MAX_BLOCKS:
+                        return None
+                    writer.write(block)
+                    number = self.count
+                    self.count += 1
+                    added[block] = number
+                    self.__add_to_index(block, number)
+                refs.append(number)
+        return refs
+
+    def __find(self, block: bytes, reader) -> Optional[int]:
+        key = BlockStore.__hash(block)
+        tag = key >> 24
+        mask = len(self.table) - 1
+        slot = key & mask
+        while self.table[slot]:
+            if self.tags[slot] == tag:
+                number = self.table[slot] - 1
+                reader.seek(number * BLOCK_SIZE)
+                if reader.read(BLOCK_SIZE) == block:
+                    return number
+            slot = (slot + 1) & mask
+        return None
+
+    def __read_refs(self, name: str) -> tuple:
+        with open(self.ref_path(name), 'rb') as fp:
+            table = fp.read()
+        return struct.unpack('<{}H'.format(len(table) // 2), table)
+
+    def __add_to_index(self, block: bytes, number: int):
+        key = BlockStore.__hash(block)
+        mask = len(self.table) - 1
+        slot = key & mask
+        while self.table[slot]:
+            slot = (slot + 1) & mask
+        self.table[slot] = number + 1
+        self.tags[slot] = key >> 24
+
+    def __reserve(self, blocks: int):
+        """Grow the index, if adding ``blocks`` would fill more than 3/4 of it.
+        """
+        if min(self.count + blocks, MAX_BLOCKS) * 4 > len(self.table) * 3:
+            self.__build_index(blocks)
+
+    def __build_index(self, reserve: int):
+        try:
+            self.count = os.stat(self.blocks_path)[6] // BLOCK_SIZE
+        except OSError:
+            self.count = 0
+        size = MIN_INDEX_SIZE
+        while size * 3 < min(self.count + reserve, MAX_BLOCKS) * 4:
+            size *= 2
+        self.table = array('H', bytearray(2 * size))
+        self.tags = bytearray(size)
+        if not self.count:
+            return
+        with open(self.blocks_path, 'rb') as fp:
+            buffer = bytearray(BLOCK_SIZE * 64)
+            view = memoryview(buffer)
+            number = 0
+            while number < self.count:
+                length = fp.readinto(buffer)
+                if not length:
+                    break
+                for offset in range(0, length - length % BLOCK_SIZE, BLOCK_SIZE):
+                    self.__add_to_index(view[offset:offset + BLOCK_SIZE], number)
+                    number += 1
+
+    def __open(self):
+        """Use the newest complete generation and remove the rest.
+        """
+        try:
+            os.stat(self.root)
+        except OSError:
+            os.mkdir(self.root)
+        entries = os.listdir(self.root)
+        generations = [int(entry) for entry in entries if entry.isdigit()]
+        self.generation = max(generations) if generations else 0
+        for entry in entries:
+            if ((entry.isdigit() and int(entry) != self.generation)
+                    or (entry.endswith(".tmp") and entry[:-4].isdigit())):
+                BlockStore.__remove_directory(self.root + "/" + entry)
+        if not generations:
+            os.mkdir(self.__directory())
+        self.blocks_path = self.__directory() + "/blocks.bin"
+        self.__build_index(0)
+
+    @staticmethod
+    def __hash(block) -> int:
+        if crc32 is None:
+            return hash(bytes(block)) & 0xFFFFFFFF
+        return crc32(block) & 0xFFFFFFFF
+
+    @staticmethod
+    def __remove_directory(path: str):
+        for entry in os.listdir(path):
+            os.remove(path + "/" + entry)
+        os.rmdir(path)
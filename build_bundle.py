@@ -0,0 +1,54 @@
+try:
+    from typing import List
+except ImportError:
+    pass
+
+import gzip
+import hashlib
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "lib"))
+
+# pylint: disable=wrong-import-position
+from adafruit_httpserver.bundle import write_bundle
+from adafruit_httpserver.mime_type import MIMEType
+
+def asset(root: str, path: str, min_gzip: int):
+    """The bundle entry of the file at ``path``, its URL path is relative to ``root``
+    """
+    with open(path, 'rb') as fp:
+        data = fp.read()
+    url_path = "/" + os.path.relpath(path, root).replace(os.sep, "/")
+    etag = '"{}"'.format(hashlib.sha256(data).hexdigest()[:16])
+    gzip_data = None
+    if (len(data) >= min_gzip):
+        gzip_data = gzip.compress(data, 9, mtime=0)
+        if (len(gzip_data) >= len(data) * 0.9):
+            gzip_data = None # e.g. images, not worth a second copy
+    return url_path, data, MIMEType.from_file_name(path), gzip_data, etag
+
+def main(argv: List[str]) -> int:
+    """Pack the files of a directory into an asset bundle for adafruit_httpserver.bundle.HTTPBundle.
+    """
+    import argparse # pylint: disable=import-outside-toplevel
+    parser = argparse.ArgumentParser(description=main.__doc__.splitlines()[0])
+    parser.add_argument("source", help="directory of the web UI, e.g. www")
+    parser.add_argument("-o", "--output", default="www.bundle", help="bundle to write")
+    parser.add_argument("--min-gzip", type=int, default=256,
+                        help="smallest file that gets a precompressed variant")
+    args = parser.parse_args(argv)
+
+    paths = []
+    for directory, directories, names in os.walk(args.source):
+        directories[:] = sorted(name for name in directories if not name.startswith("."))
+        paths.extend(os.path.join(directory, name) for name in sorted(names) if not name.startswith("."))
+    index = write_bundle(args.output, (asset(args.source, path, args.min_gzip) for path in paths))
+    for url_path, (_, length, _, gzip_length, content_type, _) in sorted(index.items()):
+        print("{:<32} {:>7} {:>7} {}".format(url_path, length, gzip_length or "-", content_type))
+    print(json.dumps({"assets": len(index), "bytes": os.stat(args.output).st_size}))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,18 +1,67 @@
+import os
+from errno import ENOSPC, ETIMEDOUT
+
 import usb_hid
 
+import json
+
+from json_stream import Base64, Hex, JSONStream
+from loop_profiler import LoopProfiler
 from portal import Portal
+from toy_import import DumpDirectory, ToyImporter
+from wifi_manager import WiFiManager
 
 #Needed for WIFI, placed in code.py since it locks up everything else otherwise
 import socketpool
 import wifi
 from adafruit_httpserver.server import HTTPServer
+from adafruit_httpserver.bundle import HTTPBundle
+from adafruit_httpserver.methods import HTTPMethod
+from adafruit_httpserver.mime_type import MIMEType
 from adafruit_httpserver.response import HTTPResponse
+from adafruit_httpserver.status import CommonHTTPStatus
 
+# Seconds to wait for the console's first report before bringing up Wi-Fi anyway
+WIFI_START_DELAY = 5
+# Milliseconds between the status reports the portal sends on its own while active
+STATUS_INTERVAL_MS = 50
+# Main loop iterations slower than this are recorded with their slowest stage
+LOOP_DEADLINE_MS = 50
+# Seconds between loop statistics on the serial console
+STATS_INTERVAL = 60
+# Bytes of JSON that are sent at a time by the streaming endpoints
+JSON_BUFFER_SIZE = 1024
+# Where /library looks for toy dumps and /import writes them, apart from the slot files
+LIBRARY_PATH = "/library"
+# Bytes of an uploaded archive that are read at a time by /import
+IMPORT_CHUNK_SIZE = 512
+# Seconds /import waits for more of the upload before serving HID reports in between
+IMPORT_READ_TIMEOUT = 0.01
+# Web UI assets packed by build_bundle.py, served instead of single files if present
+BUNDLE_PATH = "/www.bundle"
 
+SLOT_STATUSES = ("empty", "present", "removed", "added")
+BLOCK_ENCODINGS = {"hex": Hex, "base64": Base64}
 
+
+# the portal first, the toys are served over USB even if the web setup fails
+portal = Portal(usb_hid.devices, status_interval_ms=STATUS_INTERVAL_MS)
 pool = socketpool.SocketPool(wifi.radio)
 server = HTTPServer(pool)
-        
+try:
+    server.bundle = HTTPBundle(BUNDLE_PATH)
+except OSError:
+    pass # no web UI bundle, files are served from the file system
+except ValueError as error:
+    print("Ignoring web UI bundle:", error) # files are served from the file system
+profiler = LoopProfiler(LOOP_DEADLINE_MS)
+json_stream = JSONStream(JSON_BUFFER_SIZE) # one response at a time, the server polls inline
+import_buffer = bytearray(IMPORT_CHUNK_SIZE)
+try:
+    os.mkdir(LIBRARY_PATH)
+except OSError:
+    pass # it exists already
+
 
 @server.route("/")
 def base(request): # pylint: disable=unused-arguments
@@ -22,11 +71,137 @@ def base(request): # pylint: disable=unused-arguments
     return HTTPResponse(body="Hello World")
 
 
-portal = Portal(usb_hid.devices)
-server.start(str(wifi.radio.ipv4_address))
+@server.route("/stats")
+def stats(request): # pylint: disable=unused-arguments
+    """Return the main loop statistics"""
+    report = profiler.report()
+    report["http_rejections"] = server.rejections
+    report["save_failures"] = portal.save_failures
+    report["save_error"] = portal.save_error
+    return HTTPResponse(body=json.dumps(report), content_type=MIMEType.TYPE_JSON)
+
+
+def slot_entries():
+    for index in range(len(portal.slots)):
+        toy = portal.slots.toys[index]
+        yield {
+            "slot": index + 1,
+            "status": SLOT_STATUSES[portal.slots.statuses[index]],
+            "toy": toy.path if toy is not None else None,
+        }
+
+
+def toy_blocks(toy, encoding):
+    for index in range(len(toy.data) // 0x10):
+        yield encoding(toy.read_block(index))
+
+
+def file_blocks(path: str, encoding):
+    block = bytearray(0x10) # each block is written out before the next one is read
+    with open(path, 'rb') as fp:
+        while fp.readinto(block) == len(block):
+            yield encoding(block)
+
+
+def library_entries(encoding):
+    for name in sorted(os.listdir(LIBRARY_PATH)):
+        if (not name.endswith(".dump")):
+            continue
+        path = LIBRARY_PATH.rstrip("/") + "/" + name
+        entry = {"name": name, "size": os.stat(path)[6]}
+        if (encoding is not None):
+            entry["blocks"] = file_blocks(path, encoding)
+        yield entry
+
+
+def stream_json(value) -> HTTPResponse:
+    return HTTPResponse(body=json_stream.chunks(value), content_type=MIMEType.TYPE_JSON)
+
+
+@server.route("/slots")
+def slots(request): # pylint: disable=unused-arguments
+    """Return the status and toy of every slot"""
+    return stream_json(slot_entries())
+
+
+@server.route("/toy")
+def toy(request):
+    """Return the blocks of the toy in ?slot=N, hex or ?encoding=base64"""
+    encoding = BLOCK_ENCODINGS.get(request.query_params.get("encoding", "hex"))
+    try:
+        index = int(request.query_params.get("slot", "")) - 1
+    except ValueError:
+        index = -1
+    if (encoding is None or not 0 <= index < len(portal.slots)):
+        return HTTPResponse(status=CommonHTTPStatus.BAD_REQUEST_400, body="Bad slot or encoding")
+    slot_toy = portal.slots.toys[index]
+    if (slot_toy is None):
+        return HTTPResponse(status=CommonHTTPStatus.NOT_FOUND_404, body="No toy in slot")
+    return stream_json({"slot": index + 1, "path": slot_toy.path, "blocks": toy_blocks(slot_toy, encoding)})
+
+
+@server.route("/library")
+def library(request):
+    """Return the toy dumps in the library, with ?blocks=hex or base64 also their blocks"""
+    blocks = request.query_params.get("blocks")
+    encoding = BLOCK_ENCODINGS.get(blocks) if blocks else None
+    if (blocks and encoding is None):
+        return HTTPResponse(status=CommonHTTPStatus.BAD_REQUEST_400, body="Bad encoding")
+    return stream_json(library_entries(encoding))
+
+
+@server.route("/import", HTTPMethod.POST, stream_body=True)
+def import_pack(request):
+    """Import the toy dumps of a posted tar or zip archive into the library"""
+    importer = ToyImporter(DumpDirectory(LIBRARY_PATH))
+    view = memoryview(import_buffer)
+    request.stream.timeout = IMPORT_READ_TIMEOUT
+    try:
+        while True:
+            length = request.stream.readinto(import_buffer)
+            if (length == 0):
+                break
+            if (length is not None):
+                importer.feed(view[:length])
+            portal.process_reports(save=False) # the upload must not stall the game
+    except ValueError as error:
+        return HTTPResponse(status=CommonHTTPStatus.BAD_REQUEST_400, body=str(error))
+    except OSError as error:
+        if (error.errno == ETIMEDOUT):
+            return HTTPResponse(status=CommonHTTPStatus.REQUEST_TIMEOUT_408, body="Upload stalled")
+        if (error.errno == ENOSPC):
+            return HTTPResponse(status=CommonHTTPStatus.INSUFFICIENT_STORAGE_507, body="Library is full")
+        return HTTPResponse(status=CommonHTTPStatus.INTERNAL_SERVER_ERROR_500, body=str(error))
+    return stream_json(importer.close())
+
+
+def on_connect(address: str):
+    print("My MAC addr:", [hex(i) for i in wifi.radio.mac_address])
+    print("My IP address is", address)
+    server.start(address)
+
+
+network = WiFiManager(wifi.radio, os.getenv('WIFI_SSID'), os.getenv('WIFI_PASSWORD'),
+                      on_connect=on_connect, on_disconnect=server.stop)
+network.start(WIFI_START_DELAY)
 while True:
+    profiler.begin()
+    stage = "process_reports" # the stage in progress, charged with its time if it raises
     try:
-        portal.process_reports()
-        server.poll()     
-    except:
-        continue
\ No newline at end of file
+        if portal.process_reports(save=False):
+            network.start() # HID is serving reports, the network can come up now
+        profiler.stage(stage)
+        stage = "persistence"
+        portal.save_toys()
+        profiler.stage(stage)
+        stage = "server.poll"
+        if network.is_connected:
+            server.poll()
+        profiler.stage(stage)
+        stage = "network.poll"
+        network.poll()
+        profiler.stage(stage)
+    except Exception as ex: # pylint: disable=broad-except
+        profiler.exception(ex, stage)
+    profiler.end()
+    profiler.print_every(STATS_INTERVAL)
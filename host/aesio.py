@@ -0,0 +1,130 @@
+"""Stand-in for CircuitPython's `aesio` module on CPython hosts
+
+A plain Python AES, ECB mode only, for checking code that decrypts a block at a
+time. It's slow; `toy_codec` uses ``cryptography`` instead where that's
+installed and ``host/`` is not on ``sys.path``.
+"""
+
+MODE_ECB = 1
+MODE_CBC = 2
+MODE_CTR = 6
+
+
+def _xtime(value: int) -> int:
+    value <<= 1
+    return (value ^ 0x11B) if value & 0x100 else value
+
+
+def _multiply(a: int, b: int) -> int:
+    result = 0
+    while b:
+        if b & 1:
+            result ^= a
+        a = _xtime(a)
+        b >>= 1
+    return result
+
+
+def _sbox():
+    sbox = [0] * 256
+    inverse = [0] * 256
+    for value in range(256):
+        # multiplicative inverse in GF(2^8), then the affine transformation
+        inv = 0
+        if value:
+            for candidate in range(1, 256):
+                if _multiply(value, candidate) == 1:
+                    inv = candidate
+                    break
+        result = inv
+        for shift in range(1, 5):
+            result ^= ((inv << shift) | (inv >> (8 - shift))) & 0xFF
+        result ^= 0x63
+        sbox[value] = result
+        inverse[result] = value
+    return bytes(sbox), bytes(inverse)
+
+
+_SBOX, _INVERSE_SBOX = _sbox()
+
+
+def _expand_key(key: bytes):
+    words = len(key) // 4
+    rounds = words + 6
+    schedule = [list(key[4 * index : 4 * index + 4]) for index in range(words)]
+    rcon = 1
+    for index in range(words, 4 * (rounds + 1)):
+        word = list(schedule[index - 1])
+        if index % words == 0:
+            word = [_SBOX[byte] for byte in word[1:] + word[:1]]
+            word[0] ^= rcon
+            rcon = _xtime(rcon)
+        elif words > 6 and index % words == 4:
+            word = [_SBOX[byte] for byte in word]
+        schedule.append([a ^ b for a, b in zip(schedule[index - words], word)])
+    return [sum(schedule[4 * r : 4 * r + 4], []) for r in range(rounds + 1)]
+
+
+def _add_round_key(state: list, round_key: list) -> None:
+    for index in range(16):
+        state[index] ^= round_key[index]
+
+
+def _shift_rows(state: list, direction: int) -> None:
+    # the state is column major, row r of column c is state[4 * c + r]
+    for row in range(1, 4):
+        values = [state[4 * column + row] for column in range(4)]
+        for column in range(4):
+            state[4 * column + row] = values[(column + direction * row) % 4]
+
+
+def _mix_columns(state: list, factors) -> None:
+    for column in range(4):
+        values = state[4 * column : 4 * column + 4]
+        for row in range(4):
+            state[4 * column + row] = (
+                _multiply(values[row], factors[0])
+                ^ _multiply(values[(row + 1) % 4], factors[1])
+                ^ _multiply(values[(row + 2) % 4], factors[2])
+                ^ _multiply(values[(row + 3) % 4], factors[3])
+            )
+
+
+class AES:
+    """Simulated ``aesio.AES``, ECB only"""
+
+    def __init__(self, key: bytes, mode: int = MODE_ECB, IV: bytes = None) -> None:
+        # pylint: disable=invalid-name,unused-argument
+        if len(key) not in (16, 24, 32):
+            raise ValueError("Key length must be 16, 24, or 32 bytes")
+        if mode != MODE_ECB:
+            raise NotImplementedError("Only MODE_ECB is simulated")
+        self._round_keys = _expand_key(bytes(key))
+
+    def encrypt_into(self, src, dest) -> None:
+        """Encrypt the 16 bytes of ``src`` into ``dest``."""
+        state = list(bytes(src))
+        _add_round_key(state, self._round_keys[0])
+        for round_key in self._round_keys[1:-1]:
+            state = [_SBOX[byte] for byte in state]
+            _shift_rows(state, 1)
+            _mix_columns(state, (2, 3, 1, 1))
+            _add_round_key(state, round_key)
+        state = [_SBOX[byte] for byte in state]
+        _shift_rows(state, 1)
+        _add_round_key(state, self._round_keys[-1])
+        dest[0:16] = bytes(state)
+
+    def decrypt_into(self, src, dest) -> None:
+        """Decrypt the 16 bytes of ``src`` into ``dest``."""
+        state = list(bytes(src))
+        _add_round_key(state, self._round_keys[-1])
+        for round_key in reversed(self._round_keys[1:-1]):
+            _shift_rows(state, -1)
+            state = [_INVERSE_SBOX[byte] for byte in state]
+            _add_round_key(state, round_key)
+            _mix_columns(state, (14, 11, 13, 9))
+        _shift_rows(state, -1)
+        state = [_INVERSE_SBOX[byte] for byte in state]
+        _add_round_key(state, self._round_keys[0])
+        dest[0:16] = bytes(state)
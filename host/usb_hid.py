@@ -0,0 +1,50 @@
+"""Stand-in for CircuitPython's `usb_hid` module on CPython hosts
+
+Reports "sent by the console" are injected with `Device.receive`, reports sent
+by the board are counted and passed to ``Device.on_send`` if it is set.
+"""
+
+
+class Device:
+    """Simulated ``usb_hid.Device``"""
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        *,
+        report_descriptor: bytes = b"",
+        usage_page: int = 0,
+        usage: int = 0,
+        report_ids=(0,),
+        in_report_lengths=(0,),
+        out_report_lengths=(0,),
+    ) -> None:
+        self.report_descriptor = report_descriptor
+        self.usage_page = usage_page
+        self.usage = usage
+        self.report_ids = report_ids
+        self.in_report_lengths = in_report_lengths
+        self.out_report_lengths = out_report_lengths
+        self.received = None
+        self.sent_count = 0
+        self.on_send = None
+
+    def receive(self, report: bytes) -> None:
+        """Simulate an OUT report from the host, replacing any unread one."""
+        self.received = report
+
+    def get_last_received_report(self, report_id: int = None):  # pylint: disable=unused-argument
+        report, self.received = self.received, None
+        return report
+
+    def send_report(self, report, report_id: int = None) -> None:  # pylint: disable=unused-argument
+        self.sent_count += 1
+        if self.on_send is not None:
+            self.on_send(report)
+
+
+devices = ()
+
+
+def enable(enabled_devices) -> None:
+    global devices  # pylint: disable=global-statement
+    devices = tuple(enabled_devices)
@@ -0,0 +1,36 @@
+"""Stand-in for CircuitPython's `wifi` module on CPython hosts
+
+Put ``host/`` on ``sys.path`` to run board code on Linux. Connecting takes
+``radio.connect_delay`` seconds and fails ``radio.failures`` times before it
+succeeds with ``radio.address``.
+"""
+
+import time
+
+
+class Radio:
+    """Simulated ``wifi.radio``"""
+
+    def __init__(self) -> None:
+        self.ipv4_address = None
+        self.mac_address = bytes(6)
+        self.address = "127.0.0.1"
+        self.connect_delay = 0.0
+        self.failures = 0
+        self.attempts = 0
+
+    def connect(self, ssid: str, password: str = "", *, timeout: float = None) -> None:
+        # pylint: disable=unused-argument
+        self.attempts += 1
+        delay = self.connect_delay if timeout is None else min(self.connect_delay, timeout)
+        time.sleep(delay)
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("No network with that ssid")
+        self.ipv4_address = self.address
+
+    def disconnect(self) -> None:
+        self.ipv4_address = None
+
+
+radio = Radio()
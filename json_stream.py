@@ -0,0 +1,195 @@
+try:
+    from typing import Iterable, Iterator, Tuple
+except ImportError:
+    pass
+
+import json
+
+_HEX_DIGITS = b"0123456789abcdef"
+_BASE64_DIGITS = b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/"
+
+class Hex:
+    """Bytes written as a hex string, e.g. a toy block
+    """
+
+    __slots__ = ("data",)
+
+    def __init__(self, data: bytes):
+        self.data = data
+
+class Base64:
+    """Bytes written as a base64 string
+    """
+
+    __slots__ = ("data",)
+
+    def __init__(self, data: bytes):
+        self.data = data
+
+class Object:
+    """An object whose members come from an iterable of (key, value) pairs, e.g. a generator
+    """
+
+    __slots__ = ("pairs",)
+
+    def __init__(self, pairs: Iterable[Tuple[str, object]]):
+        self.pairs = pairs
+
+class JSONStream:
+    """Writes a JSON document into a fixed buffer and hands it out a buffer full at a time
+
+    `chunks` walks the value lazily: lists, tuples and other iterables become arrays and
+    are only consumed as far as the buffer has been sent, so a generator of entries can
+    describe a document far larger than RAM. `Hex` and `Base64` are encoded digit by
+    digit into the buffer, bytes are written as `Hex`. The chunks are views of the one
+    buffer, each valid until the next is asked for. `HTTPResponse` frames each of them
+    into its own reused buffer and `HTTPServer` sends it before asking for the next,
+    `AsyncHTTPServer` copies the frames because the transport may keep them.
+    """
+
+    def __init__(self, size: int = 512):
+        if (size < 8):
+            raise ValueError("The buffer must hold at least 8 bytes")
+        self.buffer = bytearray(size)
+        self._view = memoryview(self.buffer)
+        self._size = size
+        self._position = 0
+
+    def chunks(self, value) -> Iterator[memoryview]:
+        """Serialize ``value``, yielding the buffer whenever it is full and once at the end.
+        """
+        self._position = 0
+        yield from self.__value(value)
+        if (self._position):
+            yield self.__take()
+
+    def __value(self, value):
+        if (value is None):
+            yield from self.__write(b"null")
+        elif (value is True):
+            yield from self.__write(b"true")
+        elif (value is False):
+            yield from self.__write(b"false")
+        elif (isinstance(value, str)):
+            yield from self.__string(value)
+        elif (isinstance(value, (int, float))):
+            yield from self.__write(json.dumps(value).encode())
+        elif (isinstance(value, (bytes, bytearray, memoryview))):
+            yield from self.__hex(value)
+        elif (isinstance(value, Hex)):
+            yield from self.__hex(value.data)
+        elif (isinstance(value, Base64)):
+            yield from self.__base64(value.data)
+        elif (isinstance(value, dict)):
+            yield from self.__object(value.items())
+        elif (isinstance(value, Object)):
+            yield from self.__object(value.pairs)
+        else:
+            yield from self.__array(value)
+
+    def __object(self, pairs):
+        if (self._position == self._size):
+            yield self.__take()
+        self.__put(ord('{'))
+        first = True
+        for key, member in pairs:
+            if (not first):
+                if (self._position == self._size):
+                    yield self.__take()
+                self.__put(ord(','))
+            first = False
+            yield from self.__string(key)
+            if (self._position == self._size):
+                yield self.__take()
+            self.__put(ord(':'))
+            yield from self.__value(member)
+        if (self._position == self._size):
+            yield self.__take()
+        self.__put(ord('}'))
+
+    def __array(self, items):
+        if (self._position == self._size):
+            yield self.__take()
+        self.__put(ord('['))
+        first = True
+        for item in items:
+            if (not first):
+                if (self._position == self._size):
+                    yield self.__take()
+                self.__put(ord(','))
+            first = False
+            yield from self.__value(item)
+        if (self._position == self._size):
+            yield self.__take()
+        self.__put(ord(']'))
+
+    def __string(self, text: str):
+        if (any(character < ' ' or character in '"\\' for character in text)):
+            data = json.dumps(text).encode() # escaping is rare, leave it to json
+        else:
+            data = b'"' + text.encode() + b'"'
+        yield from self.__write(data)
+
+    def __hex(self, data):
+        if (self._position == self._size):
+            yield self.__take()
+        self.__put(ord('"'))
+        buffer = self.buffer
+        for byte in data:
+            if (self._position + 2 > self._size):
+                yield self.__take()
+            position = self._position
+            buffer[position] = _HEX_DIGITS[byte >> 4]
+            buffer[position + 1] = _HEX_DIGITS[byte & 0x0F]
+            self._position = position + 2
+        if (self._position == self._size):
+            yield self.__take()
+        self.__put(ord('"'))
+
+    def __base64(self, data):
+        if (self._position == self._size):
+            yield self.__take()
+        self.__put(ord('"'))
+        buffer = self.buffer
+        length = len(data)
+        for offset in range(0, length, 3):
+            if (self._position + 4 > self._size):
+                yield self.__take()
+            remaining = length - offset
+            group = data[offset] << 16
+            if (remaining > 1):
+                group |= data[offset + 1] << 8
+            if (remaining > 2):
+                group |= data[offset + 2]
+            position = self._position
+            buffer[position] = _BASE64_DIGITS[group >> 18]
+            buffer[position + 1] = _BASE64_DIGITS[group >> 12 & 0x3F]
+            buffer[position + 2] = _BASE64_DIGITS[group >> 6 & 0x3F] if remaining > 1 else ord('=')
+            buffer[position + 3] = _BASE64_DIGITS[group & 0x3F] if remaining > 2 else ord('=')
+            self._position = position + 4
+        if (self._position == self._size):
+            yield self.__take()
+        self.__put(ord('"'))
+
+    def __write(self, data: bytes):
+        view = memoryview(data)
+        while len(view):
+            if (self._position == self._size):
+                yield self.__take()
+            count = min(len(view), self._size - self._position)
+            self._view[self._position:self._position + count] = view[:count]
+            self._position += count
+            view = view[count:]
+
+    def __put(self, value: int):
+        """Append a byte, callers make sure there is room.
+        """
+        self.buffer[self._position] = value
+        self._position += 1
+
+    def __take(self) -> memoryview:
+        """The filled part of the buffer, which is reused from the start after it was sent.
+        """
+        chunk = self._view[:self._position]
+        self._position = 0
+        return chunk
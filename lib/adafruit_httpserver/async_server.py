@@ -0,0 +1,323 @@
+# SPDX-License-Identifier: MIT
+"""
+`adafruit_httpserver.async_server.AsyncHTTPServer`
+====================================================
+"""
+
+try:
+    from typing import Callable, Optional
+except ImportError:
+    pass
+
+import asyncio
+from errno import ETIMEDOUT
+import time
+
+from .limits import HTTPLimits
+from .request import HTTPRequest
+from .response import HTTPResponse
+from .route import _HTTPRoute
+from .server import HTTPServer, _Rejected
+from .status import CommonHTTPStatus, HTTPStatus
+
+
+class _AsyncBodyStream:
+    """Reads a request body from the stream as the handler asks for it."""
+
+    __slots__ = ("_reader", "_received", "_remaining", "_deadline_ns", "timeout")
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        reader: "asyncio.StreamReader",
+        received: bytes,
+        content_length: int,
+        timeout: float,
+        deadline_ns: int,
+    ) -> None:
+        self._reader = reader
+        self._received = received[:content_length]
+        self._remaining = content_length - len(self._received)
+        self._deadline_ns = deadline_ns
+        self.timeout = timeout  # seconds a single readinto waits for data
+
+    @property
+    def remaining(self) -> int:
+        """Bytes of the body that have not been read yet."""
+        return len(self._received) + self._remaining
+
+    async def readinto(self, buffer) -> Optional[int]:
+        """As ``readinto`` of the body stream of `HTTPServer`, to be awaited."""
+        if self._received:
+            length = min(len(buffer), len(self._received))
+            buffer[:length] = self._received[:length]
+            self._received = self._received[length:]
+            return length
+        if not self._remaining:
+            return 0
+        remaining_ns = self._deadline_ns - time.monotonic_ns()
+        if remaining_ns <= 0:
+            raise OSError(ETIMEDOUT, "The request body was not received in time")
+        try:
+            data = await asyncio.wait_for(
+                self._reader.read(min(len(buffer), self._remaining)),
+                min(self.timeout, remaining_ns / 1000000000),
+            )
+        except asyncio.TimeoutError:
+            return None
+        if not data:
+            self._remaining = 0  # the client closed early, the body ends here
+            return 0
+        buffer[: len(data)] = data
+        self._remaining -= len(data)
+        return len(data)
+
+
+class AsyncHTTPServer:
+    """
+    An `asyncio` streams based HTTP server, with the same routes, requests and responses
+    as `HTTPServer`. Route handlers can be plain functions or ``async`` functions.
+
+    Example::
+
+        server = AsyncHTTPServer()
+
+        @server.route("/toys")
+        async def toys(request):
+            await portal_lock.acquire()
+            ...
+            return HTTPResponse(body=listing)
+
+        asyncio.run(server.serve_forever(str(wifi.radio.ipv4_address)))
+    """
+
+    def __init__(self) -> None:
+        self._timeout = 1
+        self.route_handlers = {}
+        self._streamed_routes = set()
+        self.root_path = "/"
+        self._server = None
+        self.compression = None  # an HTTPCompression to compress responses with
+        self.bundle = None  # an HTTPBundle to serve static files from
+        self.limits = HTTPLimits()
+        self.rejections = {reason: 0 for reason in HTTPLimits.REASONS}
+        self._active = 0
+
+    route = HTTPServer.route
+    _handle_request = HTTPServer._handle_request
+
+    async def start(self, host: str, port: int = 80, root_path: str = "") -> None:
+        """
+        Start the HTTP server at the given host and port. Connections are handled by
+        tasks on the running event loop.
+
+        :param str host: host name or IP address
+        :param int port: port
+        :param str root: root directory to serve files from
+        """
+        self.root_path = root_path
+        self._server = await asyncio.start_server(
+            self._handle_connection, host, port, backlog=self.limits.backlog
+        )
+
+    async def serve_forever(self, host: str, port: int = 80, root_path: str = "") -> None:
+        """Start the HTTP server and wait until it is stopped.
+
+        :param str host: host name or IP address
+        :param int port: port
+        :param str root: root directory to serve files from
+        """
+        await self.start(host, port, root_path)
+        await self._server.wait_closed()
+
+    async def stop(self) -> None:
+        """Stop accepting connections and close the server."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle_connection(
+        self, reader: "asyncio.StreamReader", writer: "asyncio.StreamWriter"
+    ) -> None:
+        max_connections = self.limits.max_connections
+        if max_connections is None:
+            max_connections = HTTPLimits.DEFAULT_CONNECTIONS
+        if self._active >= max_connections:
+            await self._reject(
+                reader, writer, CommonHTTPStatus.SERVICE_UNAVAILABLE_503, "connections"
+            )
+            return
+        self._active += 1
+        try:
+            request = await self._receive_request(reader)
+            if request is None:
+                return
+
+            response = self._handle_request(request)
+            if not isinstance(response, HTTPResponse):
+                response = await response
+            if self.compression is not None:
+                self.compression.apply(request, response)
+
+            for chunk in response._chunks():  # pylint: disable=protected-access
+                if not isinstance(chunk, bytes):
+                    chunk = bytes(chunk)  # the transport may keep it, the buffer is reused
+                writer.write(chunk)
+                await writer.drain()
+            if request.stream is not None and request.stream.remaining:
+                # the handler answered before reading the whole body
+                await asyncio.wait_for(self._linger(reader, writer), self.limits.linger_timeout)
+        except _Rejected as rejection:
+            await self._reject(reader, writer, rejection.status, rejection.reason)
+        except (OSError, EOFError, ValueError, asyncio.TimeoutError):
+            # the client went away, also in the middle of the body, which readexactly
+            # raises as IncompleteReadError, an EOFError, or sent garbage
+            pass
+        finally:
+            self._active -= 1
+            writer.close()
+            await writer.wait_closed()
+
+    async def _receive_request(
+        self, reader: "asyncio.StreamReader"
+    ) -> Optional[HTTPRequest]:
+        """Receive a request within the limits, ``None`` if the client sent nothing."""
+        start_ns = time.monotonic_ns()
+        header_deadline_ns = start_ns + int(self.limits.header_timeout * 1000000000)
+        request_deadline_ns = start_ns + int(self.limits.request_timeout * 1000000000)
+
+        header_bytes = await self._receive_header_bytes(
+            reader, min(header_deadline_ns, request_deadline_ns)
+        )
+        if not header_bytes:
+            return None
+
+        try:
+            request = HTTPRequest(header_bytes)
+            content_length = int(request.headers.get("content-length", 0))
+            if content_length < 0:
+                raise ValueError("Negative Content-Length")
+        except ValueError as error:
+            raise _Rejected(CommonHTTPStatus.BAD_REQUEST_400, "bad_request") from error
+
+        if _HTTPRoute(request.path, request.method) in self._streamed_routes:
+            if content_length > self.limits.max_stream_bytes:
+                raise _Rejected(CommonHTTPStatus.PAYLOAD_TOO_LARGE_413, "body_size")
+            request.stream = _AsyncBodyStream(
+                reader,
+                request.body,
+                content_length,
+                self._timeout,
+                time.monotonic_ns() + int(self.limits.stream_timeout * 1000000000),
+            )
+            request.body = b""
+            return request
+
+        if content_length > self.limits.max_body_bytes:
+            raise _Rejected(CommonHTTPStatus.PAYLOAD_TOO_LARGE_413, "body_size")
+
+        body = request.body
+        if len(body) < content_length:
+            body = bytearray(body)
+            while len(body) < content_length:
+                data = await self._read(
+                    request_deadline_ns,
+                    "request_timeout",
+                    reader.read,
+                    content_length - len(body),
+                )
+                if not data:
+                    break  # the client closed early, the body ends here as in HTTPServer
+                body += data
+        request.body = bytes(body[:content_length])
+        return request
+
+    async def _receive_header_bytes(
+        self, reader: "asyncio.StreamReader", deadline_ns: int
+    ) -> bytes:
+        """
+        Receive until an empty line is received. What came after it is the start of the
+        body, as in `HTTPServer`.
+        """
+        received_bytes = b""
+        while True:
+            data = await self._read(deadline_ns, "header_timeout", reader.read, 1024)
+            if not data:
+                return received_bytes
+            start = max(0, len(received_bytes) - 3)
+            received_bytes += data
+            end = received_bytes.find(b"\r\n\r\n", start)
+            if (end if end >= 0 else len(received_bytes)) > self.limits.max_header_bytes:
+                raise _Rejected(
+                    CommonHTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE_431, "header_size"
+                )
+            if end >= 0:
+                return received_bytes
+
+    async def _read(self, deadline_ns: int, reason: str, read: Callable, *args) -> bytes:
+        """
+        ``await read(*args)``, limited to `socket_timeout` and to the deadline. A client
+        that sends nothing for that long is answered with 408 Request Timeout.
+        """
+        remaining_ns = deadline_ns - time.monotonic_ns()
+        if remaining_ns <= 0:
+            raise _Rejected(CommonHTTPStatus.REQUEST_TIMEOUT_408, reason)
+        try:
+            return await asyncio.wait_for(
+                read(*args), min(self._timeout, remaining_ns / 1000000000)
+            )
+        except asyncio.TimeoutError:
+            raise _Rejected(CommonHTTPStatus.REQUEST_TIMEOUT_408, reason) from None
+
+    async def _reject(
+        self,
+        reader: "asyncio.StreamReader",
+        writer: "asyncio.StreamWriter",
+        status: HTTPStatus,
+        reason: str,
+    ) -> None:
+        """Count a rejection and answer it with ``status`` without handling the request."""
+        self.rejections[reason] += 1
+        headers = {"Retry-After": "1"} if reason == "connections" else None
+        response = HTTPResponse(status=status, body=str(status), headers=headers)
+        try:
+            for chunk in response._chunks():  # pylint: disable=protected-access
+                writer.write(chunk)
+            await writer.drain()
+            await asyncio.wait_for(self._linger(reader, writer), self.limits.linger_timeout)
+        except (OSError, asyncio.TimeoutError):
+            pass  # the client is not listening or still sending, nothing more to do
+        finally:
+            if reason == "connections":  # not counted as active, nothing else closes it
+                writer.close()
+                await writer.wait_closed()
+
+    @staticmethod
+    async def _linger(reader: "asyncio.StreamReader", writer: "asyncio.StreamWriter") -> None:
+        """
+        Discard what the client still sends until it closes, as in `HTTPServer`, so that
+        closing does not reset the connection before the client read the reply. The
+        streams of CircuitPython and MicroPython can't half close the connection.
+        """
+        if hasattr(writer, "write_eof") and writer.can_write_eof():
+            writer.write_eof()
+        while await reader.read(4096):
+            pass
+
+    @property
+    def socket_timeout(self) -> int:
+        """
+        Timeout for each read of the header and of the body of a request, a client that
+        sends nothing for this long is answered with 408 Request Timeout. The whole
+        request is limited by `limits`. Same as `HTTPServer.socket_timeout`.
+        """
+        return self._timeout
+
+    @socket_timeout.setter
+    def socket_timeout(self, value: int) -> None:
+        if isinstance(value, (int, float)) and value > 0:
+            self._timeout = value
+        else:
+            raise ValueError(
+                "AsyncHTTPServer.socket_timeout must be a positive numeric value."
+            )
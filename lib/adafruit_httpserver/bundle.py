@@ -0,0 +1,227 @@
+# SPDX-License-Identifier: MIT
+"""
+`adafruit_httpserver.bundle.HTTPBundle`
+====================================================
+"""
+
+try:
+    from typing import Dict, Generator, Iterable, Optional, Tuple
+except ImportError:
+    pass
+
+try:
+    from threading import Lock
+except ImportError:
+    Lock = None
+
+import json
+import os
+import struct
+
+from .compression import _negotiate_encoding
+from .request import HTTPRequest
+from .response import HTTPResponse
+from .status import CommonHTTPStatus
+
+MAGIC = b"HTB1"
+# magic, length of the index
+_HEADER = "<4sI"
+_HEADER_SIZE = struct.calcsize(_HEADER)
+# reads at an offset without the file position, which forked workers share, CPython on POSIX
+_preadv = getattr(os, "preadv", None)
+
+
+class HTTPBundle:
+    """
+    Static assets packed into one bundle file by ``build_bundle.py``, served by seeking
+    inside one open file instead of a stat, an open and a close for every request.
+    Where there is ``os.preadv`` the file position is not used, so a bundle opened before
+    `hosting.serve_prefork` forks its workers can be shared by them.
+
+    The bundle starts with ``MAGIC``, the length of the index as a little endian
+    ``uint32`` and the index, a JSON object of URL path to
+    ``[offset, length, gzip_offset, gzip_length, content_type, etag]``. The index is
+    read once, when the bundle is opened. ``gzip_length`` is 0 for assets without a
+    precompressed variant, the variant is sent to clients that accept gzip. Requests with
+    a matching ``If-None-Match`` are answered with 304 Not Modified.
+
+    Example::
+
+        server = HTTPServer(pool)
+        server.bundle = HTTPBundle("/www.bundle")
+    """
+
+    def __init__(
+        self,
+        path: str,
+        index_name: str = "index.html",
+        cache_control: str = "no-cache",
+        chunk_size: int = 2048,
+    ) -> None:
+        """
+        :param str path: the bundle file
+        :param str index_name: asset sent for paths ending in ``/``
+        :param str cache_control: ``Cache-Control`` header of the assets, ``no-cache``
+          makes clients revalidate with the ETag, which costs a 304 but no body
+        :param int chunk_size: bytes read from the bundle at a time per response
+
+        Raises ``OSError`` if the file can't be opened and ``ValueError`` if it's not a
+        bundle or its index is truncated or corrupt.
+        """
+        self.path = path
+        self.index_name = index_name
+        self.cache_control = cache_control
+        self.chunk_size = chunk_size
+        self._lock = Lock() if Lock is not None else None
+        self._file = open(path, "rb")  # pylint: disable=consider-using-with
+        self._position = 0  # of the file, seeking costs a read of the buffered file
+        try:
+            header = self._file.read(_HEADER_SIZE)
+            if len(header) < _HEADER_SIZE or header[:4] != MAGIC:
+                raise ValueError(f"{path} is not an asset bundle")
+            _, index_length = struct.unpack(_HEADER, header)
+            self._index = json.loads(self._file.read(index_length))
+            if not isinstance(self._index, dict):
+                raise ValueError(f"{path} has a corrupt index")
+            self._position = _HEADER_SIZE + index_length
+        except Exception:
+            self._file.close()
+            raise
+
+    def __contains__(self, path: str) -> bool:
+        return self._lookup(path) is not None
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def close(self) -> None:
+        """Close the bundle file."""
+        self._file.close()
+
+    def response(self, request: HTTPRequest) -> Optional[HTTPResponse]:
+        """The response for the asset at the path of ``request``, ``None`` if there is none."""
+        entry = self._lookup(request.path)
+        if entry is None:
+            return None
+        offset, length, gzip_offset, gzip_length, content_type, etag = entry
+
+        headers = {"ETag": etag, "Cache-Control": self.cache_control}
+        if gzip_length:
+            headers["Vary"] = "Accept-Encoding"
+
+        if _etag_matches(request.headers.get("if-none-match", ""), etag):
+            return HTTPResponse(
+                status=CommonHTTPStatus.NOT_MODIFIED_304,
+                headers=headers,
+                content_type=content_type,
+            )
+
+        if gzip_length and _negotiate_encoding(
+            request.headers.get("accept-encoding", ""), ("gzip",)
+        ):
+            offset, length = gzip_offset, gzip_length
+            headers["Content-Encoding"] = "gzip"
+        headers["Content-Length"] = str(length)
+        return HTTPResponse(
+            body=self._read(offset, length),
+            headers=headers,
+            content_type=content_type,
+        )
+
+    def _lookup(self, path: str) -> Optional[list]:
+        if path.endswith("/"):
+            path += self.index_name
+        return self._index.get(path, None)
+
+    def _read(self, offset: int, length: int) -> Generator[memoryview, None, None]:
+        """
+        Yields ``length`` bytes of the bundle from ``offset`` on, in views of one buffer
+        that is reused for the next chunk.
+        """
+        view = memoryview(bytearray(min(self.chunk_size, length) or 1))
+        size = len(view)
+        while length > 0:
+            if length < size:
+                size = length
+                view = view[:size]
+            if self._lock is None or _preadv is not None:
+                count = self._read_into(offset, view)
+            else:
+                with self._lock:  # the file position is shared by all responses
+                    count = self._read_into(offset, view)
+            if not count:
+                raise OSError(f"{self.path} is truncated")
+            offset += count
+            length -= count
+            yield view if count == size else view[:count]
+
+    def _read_into(self, offset: int, view: memoryview) -> int:
+        if _preadv is not None:
+            return _preadv(self._file.fileno(), (view,), offset)
+        if offset != self._position:
+            self._file.seek(offset)
+        count = self._file.readinto(view)
+        self._position = offset + count
+        return count
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Whether ``etag`` is one of the tags in an ``If-None-Match`` header, compared weakly."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    etag = etag[2:] if etag.startswith("W/") else etag
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if (tag[2:] if tag.startswith("W/") else tag) == etag:
+            return True
+    return False
+
+
+def write_bundle(
+    path: str, assets: Iterable[Tuple[str, bytes, str, Optional[bytes], str]]
+) -> Dict[str, list]:
+    """
+    Write a bundle of ``(url_path, data, content_type, gzip_data, etag)`` assets to
+    ``path``, ``gzip_data`` is ``None`` for assets without a precompressed variant.
+    Returns the index.
+    """
+    assets = list(assets)
+    index = {}
+    offset = 0  # relative to the data until the length of the index is known
+    for url_path, data, content_type, gzip_data, etag in assets:
+        gzip_length = len(gzip_data) if gzip_data is not None else 0
+        index[url_path] = [
+            offset,
+            len(data),
+            offset + len(data),
+            gzip_length,
+            content_type,
+            etag,
+        ]
+        offset += len(data) + gzip_length
+
+    # the offsets in the index change its length, so repeat until it stops changing
+    start = 0
+    while True:
+        encoded = json.dumps(
+            {
+                url_path: [entry[0] + start, entry[1], entry[2] + start] + entry[3:]
+                for url_path, entry in index.items()
+            },
+            separators=(",", ":"),
+            sort_keys=True,
+        ).encode("utf-8")
+        if _HEADER_SIZE + len(encoded) == start:
+            break
+        start = _HEADER_SIZE + len(encoded)
+
+    with open(path, "wb") as file:
+        file.write(struct.pack(_HEADER, MAGIC, len(encoded)))
+        file.write(encoded)
+        for _, data, _, gzip_data, _ in assets:
+            file.write(data)
+            if gzip_data is not None:
+                file.write(gzip_data)
+    return json.loads(encoded)
@@ -0,0 +1,231 @@
+# SPDX-License-Identifier: MIT
+"""
+`adafruit_httpserver.compression.HTTPCompression`
+====================================================
+"""
+
+try:
+    from typing import Generator, Iterable, Optional, Tuple, Union
+except ImportError:
+    pass
+
+try:
+    import zlib
+except ImportError:
+    zlib = None
+
+try:
+    import hashlib
+except ImportError:
+    hashlib = None
+
+try:
+    from threading import Lock
+except ImportError:
+    Lock = None
+
+from .mime_type import MIMEType
+from .request import HTTPRequest
+from .response import HTTPResponse
+
+
+class HTTPCompression:
+    """
+    Compresses response bodies with gzip or deflate, whichever the client accepts.
+
+    Bodies shorter than ``min_size`` or of other content types than ``content_types`` are
+    sent as they are. Compressed bodies are kept in an LRU cache keyed by the hash of the
+    uncompressed body, so a body that is sent again, e.g. an unchanged toy listing, is not
+    compressed again. Iterable bodies are compressed as they are streamed.
+
+    Needs a ``zlib`` module with ``compressobj``, as in CPython; without one `available`
+    is ``False`` and responses are sent uncompressed.
+
+    Example::
+
+        server = HTTPServer(pool)
+        server.compression = HTTPCompression(min_size=256)
+    """
+
+    ENCODINGS = ("gzip", "deflate")
+    # zlib window bits that select the gzip and the zlib ("deflate") container
+    _WBITS = {"gzip": 16, "deflate": 0}
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        min_size: int = 512,
+        level: int = 6,
+        window_bits: int = 15,
+        cache_entries: int = 8,
+        cache_bytes: int = 32768,
+        content_types: Iterable[str] = (
+            MIMEType.TYPE_HTML,
+            MIMEType.TYPE_CSS,
+            MIMEType.TYPE_JS,
+            MIMEType.TYPE_JSON,
+            MIMEType.TYPE_TXT,
+            MIMEType.TYPE_SVG,
+            MIMEType.TYPE_XML,
+        ),
+    ) -> None:
+        self.min_size = min_size
+        self.level = level
+        self.window_bits = window_bits
+        self.cache_entries = cache_entries
+        self.cache_bytes = cache_bytes
+        self.content_types = tuple(content_types)
+        self.hits = 0
+        self.misses = 0
+        self._cache = {}
+        self._order = []  # cache keys, least recently used first
+        self._cached_bytes = 0
+        self._lock = Lock() if Lock is not None else None
+
+    @property
+    def available(self) -> bool:
+        """Whether this build of Python can compress."""
+        return zlib is not None and hasattr(zlib, "compressobj")
+
+    def negotiate(self, accept_encoding: str) -> Optional[str]:
+        """
+        The encoding to use for a request with the given ``Accept-Encoding`` header,
+        or ``None``. gzip is preferred over deflate when both are equally acceptable.
+        """
+        if not self.available:
+            return None
+        return _negotiate_encoding(accept_encoding, self.ENCODINGS)
+
+    def apply(self, request: HTTPRequest, response: HTTPResponse) -> None:
+        """Compress the body of ``response`` if ``request`` accepts it and it is worth it."""
+        if response.filename is not None or "Content-Encoding" in response.headers:
+            return
+        if "Content-Length" in response.headers:
+            return  # a stream of a fixed length, e.g. an asset of an HTTPBundle
+        if response.content_type.split(";")[0] not in self.content_types:
+            return
+        encoding = self.negotiate(request.headers.get("accept-encoding", ""))
+        if encoding is None:
+            return
+
+        body = response.body
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        if isinstance(body, (bytes, bytearray)):
+            if len(body) < self.min_size:
+                return
+            compressed = self.compress(body, encoding)
+            if len(compressed) >= len(body):
+                return
+            response.body = compressed
+        else:
+            response.body = self.compress_stream(body, encoding)
+
+        response.headers["Content-Encoding"] = encoding
+        response.headers["Vary"] = "Accept-Encoding"
+
+    def compress(self, body: bytes, encoding: str) -> bytes:
+        """``body`` compressed with ``encoding``, from the cache if it was compressed before."""
+        key = self._key(body, encoding)
+        compressed = self._lookup(key)
+        if compressed is not None:
+            self.hits += 1
+            return compressed
+        self.misses += 1
+        compressor = self._compressor(encoding)
+        compressed = compressor.compress(body) + compressor.flush()
+        self._store(key, compressed)
+        return compressed
+
+    def compress_stream(
+        self, chunks: Iterable[Union[str, bytes]], encoding: str
+    ) -> Generator[bytes, None, None]:
+        """Compress ``chunks`` as they come, yielding compressed data whenever there is some."""
+        compressor = self._compressor(encoding)
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode("utf-8")
+            compressed = compressor.compress(chunk)
+            if compressed:
+                yield compressed
+        yield compressor.flush()
+
+    def clear(self) -> None:
+        """Empty the cache."""
+        self._cache = {}
+        self._order = []
+        self._cached_bytes = 0
+
+    def _compressor(self, encoding: str):
+        return zlib.compressobj(
+            self.level, zlib.DEFLATED, self.window_bits + self._WBITS[encoding]
+        )
+
+    @staticmethod
+    def _key(body: bytes, encoding: str) -> object:
+        if hashlib is not None and hasattr(hashlib, "sha256"):
+            return encoding + hashlib.sha256(body).hexdigest()
+        return (encoding, bytes(body))  # no hash to trust, the body itself is the key
+
+    def _lookup(self, key: object) -> Optional[bytes]:
+        if self._lock is not None:
+            with self._lock:
+                return self._touch(key)
+        return self._touch(key)
+
+    def _touch(self, key: object) -> Optional[bytes]:
+        compressed = self._cache.get(key)
+        if compressed is not None:
+            self._order.remove(key)
+            self._order.append(key)
+        return compressed
+
+    def _store(self, key: object, compressed: bytes) -> None:
+        if len(compressed) > self.cache_bytes or not self.cache_entries:
+            return
+        if self._lock is not None:
+            with self._lock:
+                self._insert(key, compressed)
+        else:
+            self._insert(key, compressed)
+
+    def _insert(self, key: object, compressed: bytes) -> None:
+        if key in self._cache:
+            return
+        while self._order and (
+            len(self._order) >= self.cache_entries
+            or self._cached_bytes + len(compressed) > self.cache_bytes
+        ):
+            evicted = self._order.pop(0)
+            self._cached_bytes -= len(self._cache.pop(evicted))
+        self._cache[key] = compressed
+        self._order.append(key)
+        self._cached_bytes += len(compressed)
+
+
+def _negotiate_encoding(accept_encoding: str, encodings: Tuple[str, ...]) -> Optional[str]:
+    """
+    The one of ``encodings`` with the highest quality in an ``Accept-Encoding`` header,
+    or ``None``. ``*`` stands for the encodings the header doesn't name, so one refused
+    with ``q=0`` is never picked. Earlier ``encodings`` win ties.
+    """
+    qualities = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.partition(";")
+        name = name.strip().lower()
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                continue
+        qualities[name] = quality
+
+    best = None
+    best_quality = 0.0
+    for name in encodings:
+        quality = qualities.get(name, qualities.get("*", 0.0))
+        if quality > best_quality:
+            best = name
+            best_quality = quality
+    return best
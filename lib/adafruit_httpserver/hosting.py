@@ -0,0 +1,131 @@
+# SPDX-License-Identifier: MIT
+"""
+`adafruit_httpserver.hosting`
+====================================================
+Running `HTTPServer` on several cores of a CPython host.
+"""
+
+try:
+    from typing import List, Optional
+except ImportError:
+    pass
+
+import os
+import signal
+import time
+import traceback
+
+from .server import HTTPServer
+
+
+def serve_prefork(
+    server: HTTPServer,
+    host: str,
+    port: int = 80,
+    root_path: str = "",
+    workers: Optional[int] = None,
+    respawn_delay: float = 1.0,
+) -> None:
+    """
+    Fork ``workers`` processes, one per CPU by default, that each listen on ``port`` with
+    ``SO_REUSEPORT`` and serve the routes of ``server`` until they are stopped.
+    A worker that exits is replaced, after ``respawn_delay`` seconds if it didn't last that
+    long. Returns when all workers have exited after SIGINT or SIGTERM, which are passed
+    on to them.
+
+    Workers don't share memory, state that route handlers change is per worker.
+    Requires ``os.fork`` and ``SO_REUSEPORT``, i.e. CPython on Linux or BSD.
+
+    Example::
+
+        server = HTTPServer(socket)
+
+        @server.route("/")
+        def base(request):
+            return HTTPResponse(body="Hello World")
+
+        serve_prefork(server, "0.0.0.0", 8080, workers=4)
+    """
+    started = time.monotonic()
+    pids = {pid: started for pid in start_workers(server, host, port, root_path, workers)}
+    stopping = []
+
+    def forward(signum, _frame):
+        stopping.append(signum)
+        for pid in list(pids):
+            try:
+                os.kill(pid, signum)
+            except OSError:
+                pass
+
+    previous = {
+        signum: signal.signal(signum, forward)
+        for signum in (signal.SIGINT, signal.SIGTERM)
+    }
+    try:
+        while pids:
+            try:
+                pid, _ = os.wait()
+            except InterruptedError:
+                continue
+            except ChildProcessError:
+                break
+            started = pids.pop(pid, None)
+            if started is None or stopping:
+                continue
+            if time.monotonic() - started < respawn_delay:
+                time.sleep(respawn_delay)  # don't fork in a loop if workers fail at once
+            if not stopping:
+                for pid in start_workers(server, host, port, root_path, 1):
+                    pids[pid] = time.monotonic()
+                if stopping:  # the signal came while forking
+                    forward(stopping[0], None)
+    finally:
+        for signum, handler in previous.items():
+            signal.signal(signum, handler)
+
+
+def start_workers(
+    server: HTTPServer,
+    host: str,
+    port: int = 80,
+    root_path: str = "",
+    workers: Optional[int] = None,
+) -> List[int]:
+    """
+    Fork the worker processes of `serve_prefork` and return their pids without waiting.
+    """
+    workers = workers or os.cpu_count() or 1
+    pids = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            status = 0
+            try:
+                signal.signal(signal.SIGINT, signal.SIG_DFL)
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                run_worker(server, host, port, root_path)
+            except BaseException:  # pylint: disable=broad-except
+                traceback.print_exc()
+                status = 1
+            finally:
+                os._exit(status)  # pylint: disable=protected-access
+        pids.append(pid)
+    return pids
+
+
+def run_worker(server: HTTPServer, host: str, port: int = 80, root_path: str = "") -> None:
+    """
+    Serve ``server`` in this process on a port shared with other workers. Does not return.
+    """
+    server.start(host, port, root_path, reuse_port=True)
+    # a worker does nothing but serve, so it can wait in accept() instead of polling
+    server._sock.setblocking(True)  # pylint: disable=protected-access
+    while True:
+        try:
+            server.poll()
+        except OSError:
+            continue
+        except Exception:  # pylint: disable=broad-except
+            # one failing request or handler must not take the worker down
+            traceback.print_exc()
@@ -0,0 +1,87 @@
+# SPDX-License-Identifier: MIT
+"""
+`adafruit_httpserver.limits.HTTPLimits`
+====================================================
+"""
+
+try:
+    from typing import Optional
+except ImportError:
+    pass
+
+
+class HTTPLimits:  # pylint: disable=too-few-public-methods
+    """
+    Bounds on the connections and requests a server accepts.
+
+    Requests over a limit are answered right away with ``503 Service Unavailable``,
+    ``431 Request Header Fields Too Large``, ``413 Payload Too Large`` or
+    ``408 Request Timeout`` and counted in the server's ``rejections``.
+
+    Example::
+
+        server = HTTPServer(pool)
+        server.limits = HTTPLimits(max_body_bytes=4096, header_timeout=1)
+    """
+
+    REASONS = (
+        "connections",
+        "header_size",
+        "body_size",
+        "header_timeout",
+        "request_timeout",
+        "bad_request",
+    )
+    """Keys of a server's ``rejections`` counters."""
+
+    DEFAULT_CONNECTIONS = 4
+    """Requests handled at once when ``max_connections`` is ``None``, without an executor."""
+
+    __slots__ = (
+        "backlog",
+        "max_connections",
+        "max_header_bytes",
+        "max_body_bytes",
+        "header_timeout",
+        "request_timeout",
+        "linger_timeout",
+        "max_stream_bytes",
+        "stream_timeout",
+    )
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        backlog: int = 10,
+        max_connections: Optional[int] = None,
+        max_header_bytes: int = 8192,
+        max_body_bytes: int = 32768,
+        header_timeout: float = 2,
+        request_timeout: float = 5,
+        linger_timeout: float = 2,
+        max_stream_bytes: int = 1048576,
+        stream_timeout: float = 60,
+    ) -> None:
+        """
+        :param int backlog: connections the network stack queues until they are accepted
+        :param int max_connections: requests being handled at once, more are shed with 503.
+          Only an ``executor`` or `AsyncHTTPServer` handle more than one at a time.
+          ``None`` allows `DEFAULT_CONNECTIONS` plus one per thread of the executor.
+        :param int max_header_bytes: size of the request line and headers
+        :param int max_body_bytes: largest ``Content-Length`` accepted
+        :param float header_timeout: seconds to receive the request line and headers
+        :param float request_timeout: seconds to receive the whole request
+        :param float linger_timeout: seconds to go on reading, and discarding, what a client
+          sends after its request was rejected, so that it gets the reply
+        :param int max_stream_bytes: largest ``Content-Length`` accepted by routes with
+          ``stream_body=True``, which don't buffer the body
+        :param float stream_timeout: seconds to receive the whole body of such a route
+        """
+        self.backlog = backlog
+        self.max_connections = max_connections
+        self.max_header_bytes = max_header_bytes
+        self.max_body_bytes = max_body_bytes
+        self.header_timeout = header_timeout
+        self.request_timeout = request_timeout
+        self.linger_timeout = linger_timeout
+        self.max_stream_bytes = max_stream_bytes
+        self.stream_timeout = stream_timeout
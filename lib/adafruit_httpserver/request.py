@@ -19,6 +19,16 @@ class HTTPRequest:
     It is passed as first argument to route handlers.
     """
 
+    __slots__ = (
+        "method",
+        "path",
+        "query_params",
+        "http_version",
+        "headers",
+        "raw_request",
+        "stream",
+    )
+
     method: str
     """Request method e.g. "GET" or "POST"."""
 
@@ -58,8 +68,19 @@ class HTTPRequest:
     raw_request: bytes
     """Raw bytes passed to the constructor."""
 
+    stream: object
+    """
+    For routes added with ``stream_body=True``, the request body to read in pieces with
+    ``stream.readinto(buffer)``, which returns the number of bytes read, 0 at the end and
+    ``None`` if nothing arrived within ``stream.timeout`` seconds, so the caller can do
+    other work in between. ``stream.remaining`` is the number of bytes still to read.
+    `body` is empty then. In `AsyncHTTPServer` ``readinto`` has to be awaited.
+    ``None`` for other routes.
+    """
+
     def __init__(self, raw_request: bytes = None) -> None:
         self.raw_request = raw_request
+        self.stream = None
 
         if raw_request is None:
             raise ValueError("raw_request cannot be None")
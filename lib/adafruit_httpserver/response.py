@@ -8,7 +8,7 @@
 """
 
 try:
-    from typing import Optional, Dict, Union, Tuple
+    from typing import Optional, Dict, Generator, Iterable, Union, Tuple
     from socket import socket
     from socketpool import SocketPool
 except ImportError:
@@ -25,6 +25,16 @@ from .status import HTTPStatus, CommonHTTPStatus
 class HTTPResponse:
     """Details of an HTTP response. Use in `HTTPServer.route` decorator functions."""
 
+    __slots__ = (
+        "http_version",
+        "status",
+        "headers",
+        "content_type",
+        "filename",
+        "root_path",
+        "body",
+    )
+
     http_version: str
     status: HTTPStatus
     headers: Dict[str, str]
@@ -33,12 +43,12 @@ class HTTPResponse:
     filename: Optional[str]
     root_path: str
 
-    body: str
+    body: Union[str, bytes, Iterable[Union[str, bytes]]]
 
     def __init__(  # pylint: disable=too-many-arguments
         self,
         status: Union[HTTPStatus, Tuple[int, str]] = CommonHTTPStatus.OK_200,
-        body: str = "",
+        body: Union[str, bytes, Iterable[Union[str, bytes]]] = "",
         headers: Dict[str, str] = None,
         content_type: str = MIMEType.TYPE_TXT,
         filename: Optional[str] = None,
@@ -49,6 +59,10 @@ class HTTPResponse:
         Creates an HTTP response.
 
         Returns ``body`` if ``filename`` is ``None``, otherwise returns contents of ``filename``.
+
+        ``body`` can be ``str``, ``bytes`` or an iterable, e.g. a generator, of ``str`` or
+        ``bytes`` chunks, which is sent with ``Transfer-Encoding: chunked`` as it is produced,
+        or as it is if ``headers`` has its ``Content-Length``.
         """
         self.status = status if isinstance(status, HTTPStatus) else HTTPStatus(*status)
         self.body = body
@@ -65,94 +79,101 @@ class HTTPResponse:
         content_type: str = MIMEType.TYPE_TXT,
         content_length: Union[int, None] = None,
         headers: Dict[str, str] = None,
-        body: str = "",
+        body: Union[str, bytes] = b"",
     ) -> bytes:
         """Constructs the response bytes from the given parameters."""
 
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+
         response = f"{http_version} {status.code} {status.text}\r\n"
 
-        headers = headers or {}
+        headers = dict(headers) if headers else {}
 
         headers.setdefault("Content-Type", content_type)
-        headers.setdefault("Content-Length", content_length or len(body))
+        if "Transfer-Encoding" not in headers:
+            headers.setdefault("Content-Length", content_length or len(body))
         headers.setdefault("Connection", "close")
 
         for header, value in headers.items():
             response += f"{header}: {value}\r\n"
 
-        response += f"\r\n{body}"
+        response += "\r\n"
 
-        return response.encode("utf-8")
+        return response.encode("utf-8") + body
 
     def send(self, conn: Union["SocketPool.Socket", "socket.socket"]) -> None:
         """
         Send the constructed response over the given socket.
         """
+        for chunk in self._chunks():
+            self._send_bytes(conn, chunk)
 
+    def _chunks(self) -> Generator[bytes, None, None]:
+        """
+        Yields the bytes of the response, the header first and files in 2048 byte chunks.
+        Iterable bodies are yielded chunk by chunk in chunked transfer encoding, unless
+        their length is in the headers. Chunked frames are views of one reused buffer,
+        each valid until the next is asked for.
+        """
         if self.filename is not None:
             try:
                 file_length = os.stat(self.root_path + self.filename)[6]
-                self._send_file_response(
-                    conn,
-                    filename=self.filename,
-                    root_path=self.root_path,
-                    file_length=file_length,
-                    headers=self.headers,
-                )
             except OSError:
-                self._send_response(
-                    conn,
+                yield self._construct_response_bytes(
                     status=CommonHTTPStatus.NOT_FOUND_404,
                     content_type=MIMEType.TYPE_TXT,
                     body=f"{CommonHTTPStatus.NOT_FOUND_404} {self.filename}",
                 )
-        else:
-            self._send_response(
-                conn,
+                return
+            yield self._construct_response_bytes(
+                status=self.status,
+                content_type=MIMEType.from_file_name(self.filename),
+                content_length=file_length,
+                headers=self.headers,
+            )
+            with open(self.root_path + self.filename, "rb") as file:
+                while bytes_read := file.read(2048):
+                    yield bytes_read
+        elif isinstance(self.body, (str, bytes, bytearray)):
+            yield self._construct_response_bytes(
                 status=self.status,
                 content_type=self.content_type,
                 headers=self.headers,
                 body=self.body,
             )
-
-    def _send_response(  # pylint: disable=too-many-arguments
-        self,
-        conn: Union["SocketPool.Socket", "socket.socket"],
-        status: HTTPStatus,
-        content_type: str,
-        body: str,
-        headers: Dict[str, str] = None,
-    ):
-        self._send_bytes(
-            conn,
-            self._construct_response_bytes(
-                status=status,
-                content_type=content_type,
-                headers=headers,
-                body=body,
-            ),
-        )
-
-    def _send_file_response(  # pylint: disable=too-many-arguments
-        self,
-        conn: Union["SocketPool.Socket", "socket.socket"],
-        filename: str,
-        root_path: str,
-        file_length: int,
-        headers: Dict[str, str] = None,
-    ):
-        self._send_bytes(
-            conn,
-            self._construct_response_bytes(
+        elif "Content-Length" in self.headers:
+            yield self._construct_response_bytes(
                 status=self.status,
-                content_type=MIMEType.from_file_name(filename),
-                content_length=file_length,
+                content_type=self.content_type,
+                headers=self.headers,
+            )
+            for chunk in self.body:
+                yield chunk.encode("utf-8") if isinstance(chunk, str) else chunk
+        else:
+            headers = dict(self.headers)
+            headers["Transfer-Encoding"] = "chunked"
+            yield self._construct_response_bytes(
+                status=self.status,
+                content_type=self.content_type,
                 headers=headers,
-            ),
-        )
-        with open(root_path + filename, "rb") as file:
-            while bytes_read := file.read(2048):
-                self._send_bytes(conn, bytes_read)
+            )
+            # each chunk is framed in one reused buffer, so it goes out in one send
+            frame = memoryview(bytearray(0))
+            for chunk in self.body:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode("utf-8")
+                if len(chunk):  # an empty chunk would end the body
+                    size = f"{len(chunk):x}\r\n".encode()
+                    start = len(size)
+                    end = start + len(chunk)
+                    if len(frame) < end + 2:
+                        frame = memoryview(bytearray(end + 2))
+                    frame[:start] = size
+                    frame[start:end] = chunk
+                    frame[end : end + 2] = b"\r\n"
+                    yield frame[: end + 2]
+            yield b"0\r\n\r\n"
 
     @staticmethod
     def _send_bytes(
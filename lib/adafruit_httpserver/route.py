@@ -13,6 +13,8 @@ from .methods import HTTPMethod
 class _HTTPRoute:
     """Route definition for different paths, see `adafruit_httpserver.server.HTTPServer.route`."""
 
+    __slots__ = ("path", "method")
+
     def __init__(self, path: str = "", method: HTTPMethod = HTTPMethod.GET) -> None:
 
         self.path = path
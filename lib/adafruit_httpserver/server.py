@@ -8,19 +8,98 @@
 """
 
 try:
-    from typing import Callable, Protocol, Union
+    from typing import Callable, Optional, Protocol, Union
     from socket import socket
     from socketpool import SocketPool
 except ImportError:
     pass
 
+try:
+    from threading import Lock
+except ImportError:
+    Lock = None
+
 from errno import EAGAIN, ECONNRESET, ETIMEDOUT
+import time
 
+from .limits import HTTPLimits
 from .methods import HTTPMethod
 from .request import HTTPRequest
 from .response import HTTPResponse
 from .route import _HTTPRoute
-from .status import CommonHTTPStatus
+from .status import CommonHTTPStatus, HTTPStatus
+
+
+class _Rejected(Exception):
+    """A request is refused with ``status``, counted in ``HTTPServer.rejections[reason]``."""
+
+    def __init__(self, status: HTTPStatus, reason: str) -> None:
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+
+
+# bytes of a request body allocated at first, the buffer grows as the rest arrives
+_BODY_BUFFER_SIZE = 1024
+
+try:
+    _SocketTimeout = TimeoutError  # raised by CPython sockets, without an errno
+except NameError:
+    _SocketTimeout = ()
+
+
+class _BodyStream:
+    """Reads a request body from the connection as the handler asks for it."""
+
+    __slots__ = ("_sock", "_received", "_remaining", "_deadline_ns", "timeout")
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        sock: Union["SocketPool.Socket", "socket.socket"],
+        received: bytes,
+        content_length: int,
+        timeout: float,
+        deadline_ns: int,
+    ) -> None:
+        self._sock = sock
+        self._received = received[:content_length]
+        self._remaining = content_length - len(self._received)
+        self._deadline_ns = deadline_ns
+        self.timeout = timeout  # seconds a single readinto waits for data
+
+    @property
+    def remaining(self) -> int:
+        """Bytes of the body that have not been read yet."""
+        return len(self._received) + self._remaining
+
+    def readinto(self, buffer: Union[bytearray, memoryview]) -> Optional[int]:
+        """
+        Read up to ``len(buffer)`` bytes of the body into ``buffer``. Returns the number of
+        bytes read, 0 at the end and ``None`` if nothing arrived within `timeout`.
+        Raises ``OSError(ETIMEDOUT)`` once ``limits.stream_timeout`` has passed.
+        """
+        if self._received:
+            length = min(len(buffer), len(self._received))
+            buffer[:length] = self._received[:length]
+            self._received = self._received[length:]
+            return length
+        if not self._remaining:
+            return 0
+        remaining_ns = self._deadline_ns - time.monotonic_ns()
+        if remaining_ns <= 0:
+            raise OSError(ETIMEDOUT, "The request body was not received in time")
+        self._sock.settimeout(min(self.timeout, remaining_ns / 1000000000))
+        try:
+            length = self._sock.recv_into(buffer, min(len(buffer), self._remaining))
+        except OSError as ex:
+            if ex.errno in (EAGAIN, ETIMEDOUT) or isinstance(ex, _SocketTimeout):
+                return None
+            raise
+        if not length:
+            self._remaining = 0  # the client closed early, the body ends here
+            return 0
+        self._remaining -= length
+        return length
 
 
 class HTTPServer:
@@ -33,17 +112,29 @@ class HTTPServer:
           in CircuitPython or the `socket` module in CPython.
         """
         self._buffer = bytearray(1024)
+        self._buffer_view = memoryview(self._buffer)
         self._timeout = 1
         self.route_handlers = {}
+        self._streamed_routes = set()
         self._socket_source = socket_source
         self._sock = None
         self.root_path = "/"
-
-    def route(self, path: str, method: HTTPMethod = HTTPMethod.GET):
+        self.executor = None
+        self.compression = None  # an HTTPCompression to compress responses with
+        self.bundle = None  # an HTTPBundle to serve static files from
+        self.limits = HTTPLimits()
+        self.rejections = {reason: 0 for reason in HTTPLimits.REASONS}
+        self._active = 0
+        self._active_lock = Lock() if Lock is not None else None
+
+    def route(self, path: str, method: HTTPMethod = HTTPMethod.GET, stream_body: bool = False):
         """Decorator used to add a route.
 
         :param str path: filename path
         :param HTTPMethod method: HTTP method: HTTPMethod.GET, HTTPMethod.POST, etc.
+        :param bool stream_body: leave the body to the handler to read from `HTTPRequest.stream`,
+          e.g. for uploads. ``limits.max_stream_bytes`` and ``limits.stream_timeout`` apply
+          to the body then instead of ``limits.max_body_bytes`` and ``limits.request_timeout``.
 
         Example::
 
@@ -56,7 +147,12 @@ class HTTPServer:
         """
 
         def route_decorator(func: Callable) -> Callable:
-            self.route_handlers[_HTTPRoute(path, method)] = func
+            route = _HTTPRoute(path, method)
+            self.route_handlers[route] = func
+            if stream_body:
+                self._streamed_routes.add(route)
+            else:
+                self._streamed_routes.discard(route)
             return func
 
         return route_decorator
@@ -76,7 +172,9 @@ class HTTPServer:
             except OSError:
                 continue
 
-    def start(self, host: str, port: int = 80, root_path: str = "") -> None:
+    def start(
+        self, host: str, port: int = 80, root_path: str = "", reuse_port: bool = False
+    ) -> None:
         """
         Start the HTTP server at the given host and port. Requires calling
         poll() in a while loop to handle incoming requests.
@@ -84,106 +182,333 @@ class HTTPServer:
         :param str host: host name or IP address
         :param int port: port
         :param str root: root directory to serve files from
+        :param bool reuse_port: set ``SO_REUSEPORT``, so that several processes can listen
+          on the same port and the kernel spreads connections between them.
+          Only available where the socket source has ``SO_REUSEPORT``, e.g. CPython on Linux.
         """
         self.root_path = root_path
 
         self._sock = self._socket_source.socket(
             self._socket_source.AF_INET, self._socket_source.SOCK_STREAM
         )
+        if hasattr(self._socket_source, "SO_REUSEADDR"):
+            # allows restarting on the same address, e.g. after a Wi-Fi reconnect
+            self._sock.setsockopt(
+                self._socket_source.SOL_SOCKET, self._socket_source.SO_REUSEADDR, 1
+            )
+        if reuse_port:
+            if not hasattr(self._socket_source, "SO_REUSEPORT"):
+                raise ValueError("SO_REUSEPORT is not supported by the socket source.")
+            self._sock.setsockopt(
+                self._socket_source.SOL_SOCKET, self._socket_source.SO_REUSEPORT, 1
+            )
         self._sock.bind((host, port))
-        self._sock.listen(10)
+        self._sock.listen(self.limits.backlog)
         self._sock.setblocking(False)  # non-blocking socket
 
+    def stop(self) -> None:
+        """
+        Stop the HTTP server and close its socket. It can be started again with `start`.
+        """
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
     def _receive_header_bytes(
-        self, sock: Union["SocketPool.Socket", "socket.socket"]
+        self, sock: Union["SocketPool.Socket", "socket.socket"], deadline_ns: int
     ) -> bytes:
-        """Receive bytes until a empty line is received."""
-        received_bytes = bytes()
-        while b"\r\n\r\n" not in received_bytes:
+        """Receive bytes until a empty line is received.
+
+        Data is received straight into the request buffer, only headers larger than
+        the buffer are accumulated in an additional, growing copy.
+        """
+        received = 0
+        overflow = None
+        while True:
+            self._set_timeout(sock, deadline_ns, "header_timeout")
             try:
-                length = sock.recv_into(self._buffer, len(self._buffer))
-                received_bytes += self._buffer[:length]
+                if overflow is None:
+                    length = sock.recv_into(
+                        self._buffer_view[received:], len(self._buffer) - received
+                    )
+                else:
+                    length = sock.recv_into(self._buffer, len(self._buffer))
             except OSError as ex:
-                if ex.errno == ETIMEDOUT:
+                if ex.errno == EAGAIN:
+                    continue
+                # a receive that timed out at the deadline is a 408, anything else ends the header
+                self._set_timeout(sock, deadline_ns, "header_timeout")
+                break
+            if not length:
+                break
+            if overflow is None:
+                received += length
+                tail = self._buffer_view[max(0, received - length - 3) : received]
+                if b"\r\n\r\n" in bytes(tail):
+                    break
+                if received == len(self._buffer):
+                    overflow = bytearray(self._buffer)
+            else:
+                overflow += self._buffer_view[:length]
+                if b"\r\n\r\n" in bytes(overflow[-length - 3 :]):
                     break
-            except Exception as ex:
-                raise ex
-        return received_bytes
+            total = received if overflow is None else len(overflow)
+            if total > self.limits.max_header_bytes:
+                raise _Rejected(
+                    CommonHTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE_431, "header_size"
+                )
+        if overflow is None:
+            return bytes(self._buffer_view[:received])
+        return bytes(overflow)
 
     def _receive_body_bytes(
         self,
         sock: Union["SocketPool.Socket", "socket.socket"],
         received_body_bytes: bytes,
         content_length: int,
+        deadline_ns: int,
     ) -> bytes:
         """Receive bytes until the given content length is received."""
-        while len(received_body_bytes) < content_length:
+        if len(received_body_bytes) >= content_length:
+            return received_body_bytes[:content_length]
+
+        # not all of content_length up front, a client could announce a large body and
+        # send nothing on several connections
+        received = len(received_body_bytes)
+        body = bytearray(min(content_length, max(2 * received, _BODY_BUFFER_SIZE)))
+        body[:received] = received_body_bytes
+        while received < content_length:
+            if received == len(body):
+                body.extend(bytes(min(len(body), content_length - len(body))))
+            self._set_timeout(sock, deadline_ns, "request_timeout")
             try:
-                length = sock.recv_into(self._buffer, len(self._buffer))
-                received_body_bytes += self._buffer[:length]
+                length = sock.recv_into(memoryview(body)[received:], len(body) - received)
             except OSError as ex:
-                if ex.errno == ETIMEDOUT:
-                    break
-            except Exception as ex:
-                raise ex
-        return received_body_bytes[:content_length]
+                if ex.errno == EAGAIN:
+                    continue
+                # a receive that timed out at the deadline is a 408, anything else ends the body
+                self._set_timeout(sock, deadline_ns, "request_timeout")
+                break
+            if not length:
+                break
+            received += length
+        return body if received == content_length else body[:received]
+
+    def _set_timeout(
+        self, sock: Union["SocketPool.Socket", "socket.socket"], deadline_ns: int, reason: str
+    ) -> None:
+        """Limit the next receive to `socket_timeout` and to what is left until the deadline."""
+        remaining_ns = deadline_ns - time.monotonic_ns()
+        if remaining_ns <= 0:
+            raise _Rejected(CommonHTTPStatus.REQUEST_TIMEOUT_408, reason)
+        sock.settimeout(min(self._timeout, remaining_ns / 1000000000))
+
+    def _receive_request(
+        self, conn: Union["SocketPool.Socket", "socket.socket"]
+    ) -> Optional[HTTPRequest]:
+        """Receive a request within the limits, ``None`` if the client sent nothing."""
+        start_ns = time.monotonic_ns()
+        header_deadline_ns = start_ns + int(self.limits.header_timeout * 1000000000)
+        request_deadline_ns = start_ns + int(self.limits.request_timeout * 1000000000)
+
+        # Receiving data until empty line
+        header_bytes = self._receive_header_bytes(
+            conn, min(header_deadline_ns, request_deadline_ns)
+        )
+
+        # Return if no data received
+        if not header_bytes:
+            return None
+
+        try:
+            request = HTTPRequest(header_bytes)
+            content_length = int(request.headers.get("content-length", 0))
+            if content_length < 0:
+                raise ValueError("Negative Content-Length")
+        except ValueError as error:
+            raise _Rejected(CommonHTTPStatus.BAD_REQUEST_400, "bad_request") from error
+
+        if _HTTPRoute(request.path, request.method) in self._streamed_routes:
+            if content_length > self.limits.max_stream_bytes:
+                raise _Rejected(CommonHTTPStatus.PAYLOAD_TOO_LARGE_413, "body_size")
+            request.stream = _BodyStream(
+                conn,
+                request.body,
+                content_length,
+                self._timeout,
+                time.monotonic_ns() + int(self.limits.stream_timeout * 1000000000),
+            )
+            request.body = b""
+            return request
+
+        if content_length > self.limits.max_body_bytes:
+            raise _Rejected(CommonHTTPStatus.PAYLOAD_TOO_LARGE_413, "body_size")
+
+        # Receiving remaining body bytes
+        request.body = self._receive_body_bytes(
+            conn, request.body, content_length, request_deadline_ns
+        )
+        return request
+
+    def _reject(
+        self, conn: Union["SocketPool.Socket", "socket.socket"], status: HTTPStatus, reason: str
+    ) -> None:
+        """Count a rejection and answer it with ``status`` without handling the request."""
+        self.rejections[reason] += 1
+        headers = {"Retry-After": "1"} if reason == "connections" else None
+        with conn:
+            try:
+                conn.settimeout(self._timeout)
+                HTTPResponse(status=status, body=str(status), headers=headers).send(conn)
+                self._linger(conn, self._buffer)
+            except OSError:
+                pass  # the client is not listening, nothing more to do
+
+    def _linger(
+        self, conn: Union["SocketPool.Socket", "socket.socket"], buffer: bytearray
+    ) -> None:
+        """
+        Discard what the client still sends for up to ``limits.linger_timeout``, until it
+        closes. Closing with unread data resets the connection, and a reset can discard
+        the reply before the client read it.
+        """
+        if hasattr(conn, "shutdown"):
+            conn.shutdown(getattr(self._socket_source, "SHUT_WR", 1))
+        deadline_ns = time.monotonic_ns() + int(self.limits.linger_timeout * 1000000000)
+        while True:
+            remaining_ns = deadline_ns - time.monotonic_ns()
+            if remaining_ns <= 0:
+                return
+            conn.settimeout(remaining_ns / 1000000000)
+            try:
+                if not conn.recv_into(buffer, len(buffer)):
+                    return
+            except OSError as ex:
+                if ex.errno != EAGAIN:
+                    return
 
     def poll(self):
         """
         Call this method inside your main event loop to get the server to
         check for new incoming client requests. When a request comes in,
         the application callable will be invoked.
+
+        Requests that exceed `limits` are answered with an error status and
+        counted in `rejections`.
         """
         try:
             conn, _ = self._sock.accept()
-            with conn:
-                conn.settimeout(self._timeout)
+        except OSError as ex:
+            # there is no connection waiting right now, try again later.
+            if ex.errno == EAGAIN:
+                return
+            raise
 
-                # Receiving data until empty line
-                header_bytes = self._receive_header_bytes(conn)
+        if self._active >= self._max_connections():
+            self._reject(conn, CommonHTTPStatus.SERVICE_UNAVAILABLE_503, "connections")
+            return
 
-                # Return if no data received
-                if not header_bytes:
-                    return
+        try:
+            request = self._receive_request(conn)
+        except _Rejected as rejection:
+            self._reject(conn, rejection.status, rejection.reason)
+            return
+        except BaseException as ex:
+            conn.close()
+            if isinstance(ex, OSError) and ex.errno in (EAGAIN, ECONNRESET):
+                # no data in time or connection reset by peer, try again later.
+                return
+            raise
 
-                request = HTTPRequest(header_bytes)
+        if request is None:
+            conn.close()
+            return
 
-                content_length = int(request.headers.get("content-length", 0))
-                received_body_bytes = request.body
+        self._count_active(1)
+        if self.executor is None:
+            self._respond(conn, request)
+        else:
+            self.executor.submit(self._respond, conn, request)
+
+    def _max_connections(self) -> int:
+        if self.limits.max_connections is not None:
+            return self.limits.max_connections
+        # a ThreadPoolExecutor runs this many handlers at once, the rest wait in its queue
+        threads = getattr(self._executor, "_max_workers", 0) if self._executor else 0
+        return HTTPLimits.DEFAULT_CONNECTIONS + threads
+
+    def _count_active(self, change: int) -> None:
+        if self._active_lock is not None:
+            with self._active_lock:
+                self._active += change
+        else:
+            self._active += change
 
-                # Receiving remaining body bytes
-                request.body = self._receive_body_bytes(
-                    conn, received_body_bytes, content_length
-                )
+    def _respond(
+        self, conn: Union["SocketPool.Socket", "socket.socket"], request: HTTPRequest
+    ) -> None:
+        """Sends the response to ``request`` and closes ``conn``. Runs on the executor if set."""
+        try:
+            with conn:
+                try:
+                    response = self._handle_request(request)
+                    if self.compression is not None:
+                        self.compression.apply(request, response)
+                    response.send(conn)
+                    if request.stream is not None and request.stream.remaining:
+                        # the handler answered before reading the whole body
+                        self._linger(conn, bytearray(256))
+                except OSError as ex:
+                    if ex.errno != ECONNRESET:
+                        raise
+        finally:
+            self._count_active(-1)
+
+    def _handle_request(self, request: HTTPRequest) -> HTTPResponse:
+        """Returns what the route handler for ``request`` returns, or a default response."""
+        handler = self.route_handlers.get(
+            _HTTPRoute(request.path, request.method), None
+        )
 
-                handler = self.route_handlers.get(
-                    _HTTPRoute(request.path, request.method), None
-                )
+        # If a handler for route exists and is callable, call it.
+        if handler is not None and callable(handler):
+            return handler(request)
 
-                # If a handler for route exists and is callable, call it.
-                if handler is not None and callable(handler):
-                    response = handler(request)
+        # If no handler exists and request method is GET, try to serve a file,
+        # from the bundle if there is one.
+        if request.method == HTTPMethod.GET:
+            if self.bundle is not None:
+                response = self.bundle.response(request)
+                if response is not None:
+                    return response
+            return HTTPResponse(filename=request.path, root_path=self.root_path)
 
-                # If no handler exists and request method is GET, try to serve a file.
-                elif request.method == HTTPMethod.GET:
-                    response = HTTPResponse(
-                        filename=request.path, root_path=self.root_path
-                    )
+        # If no handler exists and request method is not GET, return 400 Bad Request.
+        return HTTPResponse(status=CommonHTTPStatus.BAD_REQUEST_400)
 
-                # If no handler exists and request method is not GET, return 400 Bad Request.
-                else:
-                    response = HTTPResponse(status=CommonHTTPStatus.BAD_REQUEST_400)
+    @property
+    def executor(self):
+        """
+        An executor, e.g. a ``concurrent.futures.ThreadPoolExecutor`` on CPython, that runs
+        route handlers and sends responses, while `poll` goes on accepting and reading
+        requests. Handlers may then run concurrently and must be thread safe.
 
-                response.send(conn)
-        except OSError as ex:
-            # handle EAGAIN and ECONNRESET
-            if ex.errno == EAGAIN:
-                # there is no data available right now, try again later.
-                return
-            if ex.errno == ECONNRESET:
-                # connection reset by peer, try again later.
-                return
-            raise
+        Default is ``None``, handlers are called inline by `poll`.
+
+        Example::
+
+            server = HTTPServer(socket)
+            server.executor = ThreadPoolExecutor(max_workers=8)
+
+            server.serve_forever("0.0.0.0", 8080)
+        """
+        return self._executor
+
+    @executor.setter
+    def executor(self, value) -> None:
+        if value is not None and not callable(getattr(value, "submit", None)):
+            raise ValueError("HTTPServer.executor must have a submit() method or be None.")
+        self._executor = value
 
     @property
     def request_buffer_size(self) -> int:
@@ -206,6 +531,7 @@ class HTTPServer:
     @request_buffer_size.setter
     def request_buffer_size(self, value: int) -> None:
         self._buffer = bytearray(value)
+        self._buffer_view = memoryview(self._buffer)
 
     @property
     def socket_timeout(self) -> int:
@@ -11,6 +11,8 @@
 class HTTPStatus:  # pylint: disable=too-few-public-methods
     """HTTP status codes."""
 
+    __slots__ = ("code", "text")
+
     def __init__(self, code: int, text: str):
         """Define a status code.
 
@@ -33,14 +35,36 @@ class HTTPStatus:  # pylint: disable=too-few-public-methods
 class CommonHTTPStatus(HTTPStatus):  # pylint: disable=too-few-public-methods
     """Common HTTP status codes."""
 
+    __slots__ = ()
+
     OK_200 = HTTPStatus(200, "OK")
     """200 OK"""
 
+    NOT_MODIFIED_304 = HTTPStatus(304, "Not Modified")
+    """304 Not Modified"""
+
     BAD_REQUEST_400 = HTTPStatus(400, "Bad Request")
     """400 Bad Request"""
 
     NOT_FOUND_404 = HTTPStatus(404, "Not Found")
     """404 Not Found"""
 
+    REQUEST_TIMEOUT_408 = HTTPStatus(408, "Request Timeout")
+    """408 Request Timeout"""
+
+    PAYLOAD_TOO_LARGE_413 = HTTPStatus(413, "Payload Too Large")
+    """413 Payload Too Large"""
+
+    REQUEST_HEADER_FIELDS_TOO_LARGE_431 = HTTPStatus(
+        431, "Request Header Fields Too Large"
+    )
+    """431 Request Header Fields Too Large"""
+
     INTERNAL_SERVER_ERROR_500 = HTTPStatus(500, "Internal Server Error")
     """500 Internal Server Error"""
+
+    SERVICE_UNAVAILABLE_503 = HTTPStatus(503, "Service Unavailable")
+    """503 Service Unavailable"""
+
+    INSUFFICIENT_STORAGE_507 = HTTPStatus(507, "Insufficient Storage")
+    """507 Insufficient Storage"""
@@ -0,0 +1,142 @@
+try:
+    from typing import List, Optional
+except ImportError:
+    pass
+
+import time
+
+class LightEngine:
+    """Keeps the state of the portal's lights from the console's light commands
+
+    ``C`` sets the ring color, ``L`` sets a side or the trap light and ``J`` fades a
+    side light to a color over a number of milliseconds. Commands only update the
+    target state, so a burst of them costs a few byte writes each; the sink gets at
+    most one update per frame, at ``rate_hz``, with the colors of all lights.
+    """
+
+    LED_RING = 0
+    LED_RIGHT = 1
+    LED_TRAP = 2
+    LED_LEFT = 3
+    LED_COUNT = 4
+
+    # side byte of L and J commands -> LED
+    SIDES = {0x00: LED_RIGHT, 0x01: LED_TRAP, 0x02: LED_LEFT}
+
+    def __init__(self, sink, rate_hz: int = 30):
+        """:param sink: object with a ``show(colors)`` method, ``colors`` holds r, g, b per LED
+        """
+        self.sink = sink
+        self.frame_ns = 1000000000 // rate_hz
+        self.next_frame_ns = 0
+        self.start = bytearray(3 * self.LED_COUNT) # color when the current fade started
+        self.target = bytearray(3 * self.LED_COUNT)
+        self.colors = bytearray(3 * self.LED_COUNT) # last colors sent to the sink
+        self.fade_start_ns = [0] * self.LED_COUNT
+        self.fade_ns = [0] * self.LED_COUNT
+        self.pending = 0 # bit per LED that still has to reach its target
+        self.commands = 0
+        self.frames = 0
+
+    def handle_report(self, report: bytes) -> bool:
+        """Apply a light command, returns False if the report isn't one.
+        """
+        command = report[0]
+        if (command == ord('C')):
+            self.set(self.LED_RING, report[1], report[2], report[3])
+        elif (command == ord('L')):
+            led = self.SIDES.get(report[1])
+            if (led is not None):
+                self.set(led, report[2], report[3], report[4])
+        elif (command == ord('J')):
+            led = self.SIDES.get(report[1])
+            if (led is not None):
+                self.set(led, report[2], report[3], report[4], report[5] | report[6] << 8)
+        else:
+            return False
+        self.commands += 1
+        return True
+
+    def set(self, led: int, red: int, green: int, blue: int, fade_ms: int = 0, now_ns: Optional[int] = None):
+        """Set the target color of a light, replacing whatever was pending for it.
+        """
+        if (now_ns is None):
+            now_ns = time.monotonic_ns()
+        offset = 3 * led
+        for channel in range(3): # fade from wherever the light is right now
+            self.start[offset + channel] = self.__channel(led, channel, now_ns)
+        self.target[offset] = red
+        self.target[offset + 1] = green
+        self.target[offset + 2] = blue
+        self.fade_start_ns[led] = now_ns
+        self.fade_ns[led] = fade_ms * 1000000
+        self.pending |= 1 << led
+
+    def update(self, now_ns: Optional[int] = None) -> bool:
+        """Send the current colors to the sink if a frame is due and something changed.
+        """
+        if (not self.pending):
+            return False
+        if (now_ns is None):
+            now_ns = time.monotonic_ns()
+        if (now_ns < self.next_frame_ns):
+            return False
+        self.next_frame_ns = now_ns + self.frame_ns
+        changed = False
+        for led in range(self.LED_COUNT):
+            if (not self.pending & 1 << led):
+                continue
+            if (now_ns - self.fade_start_ns[led] >= self.fade_ns[led]):
+                self.pending &= ~(1 << led)
+            for channel in range(3):
+                value = self.__channel(led, channel, now_ns)
+                if (self.colors[3 * led + channel] != value):
+                    self.colors[3 * led + channel] = value
+                    changed = True
+        if (changed):
+            self.sink.show(self.colors)
+            self.frames += 1
+        return changed
+
+    def __channel(self, led: int, channel: int, now_ns: int) -> int:
+        index = 3 * led + channel
+        elapsed = now_ns - self.fade_start_ns[led]
+        duration = self.fade_ns[led]
+        if (elapsed >= duration):
+            return self.target[index]
+        start = self.start[index]
+        return start + (self.target[index] - start) * elapsed // duration
+
+class NeoPixelSink:
+    """Shows the lights on NeoPixels, ``pixel_map`` gives the pixel of each LED
+    """
+
+    def __init__(self, pixels, pixel_map: List[int] = (0, 1, 2, 3)):
+        self.pixels = pixels
+        self.pixel_map = pixel_map
+
+    def show(self, colors: bytearray):
+        for led, pixel in enumerate(self.pixel_map):
+            self.pixels[pixel] = (colors[3 * led], colors[3 * led + 1], colors[3 * led + 2])
+        self.pixels.show()
+
+class SimulatedLightSink:
+    """Records the frames it is shown, for running the light engine off the board
+    """
+
+    def __init__(self, history: int = 256):
+        self.history = history
+        self.frames = []
+
+    def show(self, colors: bytearray):
+        self.frames.append((time.monotonic_ns(), bytes(colors)))
+        if (len(self.frames) > self.history):
+            self.frames.pop(0)
+
+    def color(self, led: int) -> tuple:
+        """The last color shown for ``led``, black before the first frame.
+        """
+        if (not self.frames):
+            return (0, 0, 0)
+        colors = self.frames[-1][1]
+        return (colors[3 * led], colors[3 * led + 1], colors[3 * led + 2])
@@ -0,0 +1,125 @@
+try:
+    from typing import Dict, List
+except ImportError:
+    pass
+
+import time
+
+class LoopProfiler:
+    """Times the stages of the main loop
+
+    Call `begin` at the top of an iteration, `stage` after each stage, `exception` with
+    the stage that raised instead, and `end` at the bottom. Iteration times go into a histogram with power of two millisecond buckets
+    that decays by half every ``window`` iterations, so it shows recent behavior.
+    Iterations over ``deadline_ms`` are recorded together with their slowest stage.
+    """
+
+    BUCKETS = 12 # <1 ms, 1 ms, 2-3 ms, 4-7 ms, ... >= 1024 ms
+
+    def __init__(self, deadline_ms: int = 50, window: int = 1000, slow_history: int = 16):
+        self.deadline_ns = deadline_ms * 1000000
+        self.window = window
+        self.slow_history = slow_history
+        self.histogram = [0] * self.BUCKETS
+        self.iterations = 0
+        self.stage_total_ns = {}
+        self.stage_max_ns = {}
+        self.slow = [] # (iteration, total ms, slowest stage, its ms), newest last
+        self.exceptions = {} # type name -> count
+        self.last_print_ns = 0
+        self.__start_ns = 0
+        self.__mark_ns = 0
+        self.__worst_stage = None
+        self.__worst_ns = 0
+        self.__in_window = 0
+
+    def begin(self):
+        self.__start_ns = self.__mark_ns = time.monotonic_ns()
+        self.__worst_stage = None
+        self.__worst_ns = 0
+
+    def stage(self, name: str):
+        """Attribute the time since the last mark to stage ``name``.
+        """
+        now = time.monotonic_ns()
+        elapsed = now - self.__mark_ns
+        self.__mark_ns = now
+        self.stage_total_ns[name] = self.stage_total_ns.get(name, 0) + elapsed
+        if (elapsed > self.stage_max_ns.get(name, 0)):
+            self.stage_max_ns[name] = elapsed
+        if (elapsed > self.__worst_ns):
+            self.__worst_ns = elapsed
+            self.__worst_stage = name
+
+    def end(self):
+        total = time.monotonic_ns() - self.__start_ns
+        self.iterations += 1
+        bucket = 0
+        millis = total // 1000000
+        while (millis and bucket < self.BUCKETS - 1):
+            millis >>= 1
+            bucket += 1
+        self.histogram[bucket] += 1
+        self.__in_window += 1
+        if (self.__in_window >= self.window):
+            self.__in_window = 0
+            for index in range(self.BUCKETS):
+                self.histogram[index] >>= 1
+        if (total > self.deadline_ns):
+            self.slow.append((self.iterations, total // 1000000, self.__worst_stage, self.__worst_ns // 1000000))
+            if (len(self.slow) > self.slow_history):
+                self.slow.pop(0)
+
+    def exception(self, ex: BaseException, stage: str = None):
+        """Count an exception the main loop swallowed. The time since the last mark is
+        attributed to ``stage``, the stage that raised it, if given.
+        """
+        if (stage is not None):
+            self.stage(stage)
+        name = type(ex).__name__
+        self.exceptions[name] = self.exceptions.get(name, 0) + 1
+
+    def report(self) -> dict:
+        """Everything collected so far, e.g. to send as JSON.
+        """
+        return {
+            "iterations": self.iterations,
+            "deadline_ms": self.deadline_ns // 1000000,
+            "histogram_ms": {self.__bucket_label(index): count for index, count in enumerate(self.histogram)},
+            "stages": {name: {"total_ms": total // 1000000, "max_ms": self.stage_max_ns[name] // 1000000}
+                       for name, total in self.stage_total_ns.items()},
+            "slow": [{"iteration": iteration, "ms": ms, "stage": stage, "stage_ms": stage_ms}
+                     for iteration, ms, stage, stage_ms in self.slow],
+            "exceptions": dict(self.exceptions),
+        }
+
+    def format(self) -> str:
+        """A few lines summary for the serial console.
+        """
+        histogram = " ".join("{}:{}".format(self.__bucket_label(index), count)
+                             for index, count in enumerate(self.histogram) if count)
+        lines = ["loop: {} iterations, ms {}".format(self.iterations, histogram)]
+        for name, total in self.stage_total_ns.items():
+            lines.append("  {}: total {} ms, max {} ms".format(name, total // 1000000, self.stage_max_ns[name] // 1000000))
+        for iteration, ms, stage, stage_ms in self.slow[-3:]:
+            lines.append("  slow #{}: {} ms, {} took {} ms".format(iteration, ms, stage, stage_ms))
+        if (self.exceptions):
+            lines.append("  exceptions: " + ", ".join("{} x{}".format(name, count) for name, count in self.exceptions.items()))
+        return "\n".join(lines)
+
+    def print_every(self, interval_s: float):
+        """Print `format` to the serial console at most every ``interval_s`` seconds.
+        """
+        now = time.monotonic_ns()
+        if (now - self.last_print_ns >= interval_s * 1000000000):
+            self.last_print_ns = now
+            print(self.format())
+
+    def __bucket_label(self, index: int) -> str:
+        if (index == 0):
+            return "<1"
+        if (index == self.BUCKETS - 1):
+            return ">={}".format(1 << (index - 1))
+        if (index == 1):
+            return "1"
+        return "{}-{}".format(1 << (index - 1), (1 << index) - 1)
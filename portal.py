@@ -1,39 +1,58 @@
 try:
-    from typing import Sequence
+    from typing import Optional, Sequence
 except ImportError:
     pass
 
 import os
 import struct
+import time
 
-import usb_hid
+try:
+    import usb_hid
+except ImportError:
+    usb_hid = None  # CPython without the host/ stand-ins
+
+from toy_snapshot import SnapshotStore
+from transport import HIDTransport
 
 class Toy:
     """Toy used per Slot in the Portal
+
+    Objects in ``observers`` have their ``block_changing(index)`` called before a block
+    is overwritten, e.g. to invalidate caches, and ``toy_saving()`` before the dump is
+    written.
     """
 
+    __slots__ = ("needs_saving", "path", "data", "observers", "_view")
+
     def __init__(self, path: str):
         self.needs_saving = False
         self.path = path
+        self.observers = []
         with open(self.path, 'rb') as fp:
-            self.data = fp.read()
+            self.data = bytearray(fp.read())
+        self._view = memoryview(self.data)
 
-    def read_block(self, index: int):
+    def read_block(self, index: int) -> memoryview:
         offset = index * 0x10
         length = offset + 0x10
-        return self.data[offset:length]
+        return self._view[offset:length]
 
     def write_block(self, index: int, block: bytes):
         offset = index * 0x10
         length = offset + len(block)
-        self.data = self.data[0:offset] + block + self.data[length:]
+        for observer in self.observers:
+            observer.block_changing(index)
+        self._view[offset:length] = block
 
     def save(self):
+        for observer in self.observers:
+            observer.toy_saving()
         with open(self.path, 'wb') as fp:
             fp.write(self.data)
 
 class Slot:
-    """Slots used by Portal
+    """Slot states used by Portal
     """
 
     STATUS_EMPTY = 0
@@ -41,10 +60,38 @@ class Slot:
     STATUS_REMOVED = 2
     STATUS_ADDED = 3
 
-    def __init__(self):
-        self.toy = None
-        self.status = Slot.STATUS_EMPTY
+    __slots__ = ()
+
+class SlotTable:
+    """Array backed slot bookkeeping for a Portal
+
+    The packed status word is updated whenever a status changes, slots whose toy needs
+    saving are kept in ``dirty`` and slots whose status changed in ``changed``, so none
+    of the per report work has to look at every slot.
+    """
+
+    MAX_SLOTS = 16 # the status word has 2 bits per slot
+
+    __slots__ = ("statuses", "toys", "dirty", "changed", "status_word")
+
+    def __init__(self, size: int):
+        if not 0 < size <= SlotTable.MAX_SLOTS:
+            raise ValueError("A portal supports 1 to {} slots".format(SlotTable.MAX_SLOTS))
+        self.statuses = bytearray(size)
+        self.toys = [None] * size
+        self.dirty = set()
+        self.changed = set()
+        self.status_word = 0x00000000
+
+    def __len__(self) -> int:
+        return len(self.statuses)
 
+    def set_status(self, index: int, status: int):
+        previous = self.statuses[index]
+        if previous != status:
+            self.statuses[index] = status
+            self.status_word ^= (previous ^ status) << 2 * index
+            self.changed.add(index)
 
 class Portal:
     """Emulates Portal of Power
@@ -63,6 +110,9 @@ class Portal:
     MAX_TOYS = 6
     DEFAULT_TOY_PATH = "/toy_{}.dump"
 
+    SNAPSHOT_ON_ADD = "added"
+    SNAPSHOT_ON_REMOVE = "removed"
+
     PORTAL_REPORT_DESCRIPTOR = bytes((
         0x06, 0x00, 0xFF,  # Usage Page (Vendor Defined 0xFF00)
         0x09, 0x01,        # Usage (0x01)
@@ -80,54 +130,147 @@ class Portal:
         0xC0,              # End Collection
     ))
 
-    def __init__(self, devices: Sequence[usb_hid.Device]) -> None:
+    def __init__(self, devices: Optional[Sequence["usb_hid.Device"]] = None, transport = None,
+                 slot_count: Optional[int] = None, toy_path: Optional[str] = None,
+                 snapshot_points: Sequence[str] = (), max_snapshots: int = 8,
+                 store = None, status_interval_ms: Optional[int] = None, lights = None) -> None:
         """Create a Portal object that will send and receive HID reports.
+
+        Pass ``transport`` instead of ``devices`` to exchange the reports some other way,
+        e.g. with a `transport.NetworkTransport`.
+
+        ``slot_count`` (default `MAX_TOYS`, at most `SlotTable.MAX_SLOTS`) and ``toy_path``
+        (default `DEFAULT_TOY_PATH`) are per portal, so several portals can run side by side
+        with their own toys, e.g. ``toy_path="/portal2/toy_{}.dump"``.
+
+        ``snapshot_points`` lists when a `toy_snapshot.SnapshotStore` snapshot is taken
+        automatically: `SNAPSHOT_ON_ADD` and/or `SNAPSHOT_ON_REMOVE`. With none, toys
+        get no snapshot store.
+
+        With a `block_store.BlockStore` as ``store``, ``toy_path`` names toys in the store
+        instead of dump files.
+
+        With ``status_interval_ms`` the portal sends status reports on its own while it is
+        active, like a real portal: every ``status_interval_ms``, right after a slot changed
+        and, as always, when the console asks.
+
+        Light commands (``C``, ``J``, ``L``) are passed to ``lights``, a `lights.LightEngine`,
+        if there is one and dropped otherwise.
         """
-        self.portal_hid = self.__find_device(devices)
+        self.slot_count = slot_count or self.MAX_TOYS
+        self.toy_path = toy_path or self.DEFAULT_TOY_PATH
+        self.snapshot_points = snapshot_points
+        self.max_snapshots = max_snapshots
+        self.store = store
+        self.lights = lights
+        self.snapshots = [None] * self.slot_count
+        if transport is None:
+            transport = HIDTransport(devices, self.USAGE_PAGE, self.USAGE, self.REPORT_ID)
+        self.transport = transport
+        self.report_out = bytearray(self.REPORT_LENGTH)
+        self.status_out = bytearray(self.REPORT_LENGTH)
+        self.status_out[0] = ord('S')
+        self.status_interval_ns = status_interval_ms * 1000000 if status_interval_ms else 0
+        self.next_status_ns = 0
         self.status_index = 0x00
         self.is_active = 0x00
+        self.save_failures = 0
+        self.save_error = None
         self.__init_slots()
 
-    def __find_device(self, devices: Sequence[usb_hid.Device]) -> usb_hid.Device:
-        """Search through the provided sequence of devices to find the USB HID Portal device.
+    def process_reports(self, save: bool = True) -> bool:
+        """Handle all received reports, if any, and send scheduled status reports.
+        Returns whether a report was handled.
+
+        With ``save=False`` written toys are left for `save_toys`.
         """
-        if hasattr(devices, "send_report"):
-            devices = [devices]  # type: ignore
-        for device in devices:
-            if (device.usage_page == self.USAGE_PAGE and device.usage == self.USAGE and hasattr(device, "send_report")):
-                return device
-        raise ValueError("Could not find matching HID device.")
-
-    def process_reports(self):
-        report_in = self.portal_hid.get_last_received_report()
-        if (report_in != None):
+        handled = False
+        report_in = self.transport.receive()
+        while (report_in != None):
             self.__handle_incoming_report(report_in)
+            handled = True
+            report_in = self.transport.receive()
+        scheduled = self.__send_scheduled_status()
+        if (self.lights is not None):
+            self.lights.update()
+        if handled or scheduled:
+            self.transport.flush()
+        if handled and save:
             self.__save_toys()
+        return handled
+
+    def save_toys(self):
+        """Save every toy written since the last save.
+
+        Toys that can't be saved, e.g. because the store is full, are counted in
+        ``save_failures`` and the last reason is kept in ``save_error``.
+        """
+        self.__save_toys()
+
+    def restore_snapshot(self, index: int, name: str) -> int:
+        """Roll the toy in slot ``index`` back to its snapshot ``name``, returns the number
+        of blocks written. The toy is saved with the next `save_toys`.
+        """
+        store = self.snapshots[index]
+        if (store is None):
+            raise ValueError("No snapshots of slot {}".format(index + 1))
+        written = store.restore(name)
+        if (written):
+            self.slots.dirty.add(index)
+        return written
+
+    def __send_scheduled_status(self) -> bool:
+        if (not self.is_active or not self.status_interval_ns):
+            return False
+        if (not self.slots.changed and time.monotonic_ns() < self.next_status_ns):
+            return False
+        self.__status()
+        return True
 
     def update_slot(self, index: int, status: int):
         if (status == Slot.STATUS_ADDED):
-            toy_path = self.DEFAULT_TOY_PATH.format(index + 1)
-            if (Portal.file_exists(toy_path)):
-                self.slots[index].toy = Toy(toy_path)
-                self.slots[index].status = Slot.STATUS_ADDED
+            self.__release_toy(index)
+            toy_path = self.toy_path.format(index + 1)
+            if (self.store is not None and self.store.has(toy_path)):
+                toy = self.store.load_toy(toy_path)
+            elif (self.store is None and Portal.file_exists(toy_path)):
+                toy = Toy(toy_path)
             else:
-                self.slots[index].toy = None
-                self.slots[index].status = Slot.STATUS_EMPTY
+                toy = None
+            if (toy is not None):
+                self.slots.toys[index] = toy
+                self.slots.set_status(index, Slot.STATUS_ADDED)
+                if (self.snapshot_points):
+                    self.snapshots[index] = SnapshotStore(toy, self.max_snapshots)
+                    self.__snapshot(index, Portal.SNAPSHOT_ON_ADD)
+            else:
+                self.slots.set_status(index, Slot.STATUS_EMPTY)
         elif (status == Slot.STATUS_REMOVED):
-            self.slots[index].toy = None
-            self.slots[index].status = Slot.STATUS_REMOVED
+            self.__snapshot(index, Portal.SNAPSHOT_ON_REMOVE)
+            self.__release_toy(index)
+            self.slots.set_status(index, Slot.STATUS_REMOVED)
         elif (status == Slot.STATUS_PRESENT):
-            self.slots[index].status = Slot.STATUS_PRESENT
+            self.slots.set_status(index, Slot.STATUS_PRESENT)
+
+    def __snapshot(self, index: int, point: str):
+        store = self.snapshots[index]
+        if (store is not None and point in self.snapshot_points):
+            store.take(prefix=point)
+            store.save()
+
+    def __release_toy(self, index: int):
+        self.__save_toy(index)
+        self.slots.toys[index] = None
+        if (self.snapshots[index] is not None):
+            self.snapshots[index].close()
+            self.snapshots[index] = None
 
     def __handle_incoming_report(self, report_in: bytes):
         if (report_in[0] == ord('A')):
             self.__activate(report_in)
-        elif (report_in[0] == ord('C')): # ignore
-            pass # ignore color request
-        elif (report_in[0] == ord('J')): # ignore
-            pass # ignore sound request
-        elif (report_in[0] == ord('L')): # ignore
-            pass # ignore light (Trap slot)
+        elif (report_in[0] == ord('C') or report_in[0] == ord('J') or report_in[0] == ord('L')):
+            if (self.lights is not None):
+                self.lights.handle_report(report_in)
         elif (report_in[0] == ord('M')): # ignore
             pass # ignore speaker request -> ignore")
         elif (report_in[0] == ord('Q')):
@@ -143,54 +286,68 @@ class Portal:
 
     def __reset(self):
         self.status_index = 0x00
-        report_out = struct.pack('>bH29x', ord('R'), 0x0218)
-        self.portal_hid.send_report(report_out, self.REPORT_ID)
+        struct.pack_into('>BH29x', self.report_out, 0, ord('R'), 0x0218)
+        self.transport.send(self.report_out)
 
     def __status(self):
-        slot_status = 0x00000000
-        for index in range(self.MAX_TOYS):
-            slot_status ^= self.slots[index].status << 2 * (index)
-        report_out = struct.pack('<bIbb25x', ord('S'), slot_status, self.status_index, self.is_active)
-        self.portal_hid.send_report(report_out, self.REPORT_ID)
+        # only the fields change, the rest of the frame was filled in once
+        struct.pack_into('<IBB', self.status_out, 1, self.slots.status_word, self.status_index, self.is_active)
+        self.slots.changed.clear()
+        self.transport.send(self.status_out)
+        if (self.status_interval_ns):
+            self.next_status_ns = time.monotonic_ns() + self.status_interval_ns
         self.status_index += 1
         self.status_index %= 0xFF
 
     def __activate(self, report_in: bytes):
         self.is_active = report_in[1]
-        report_out = struct.pack('>bbH28x', ord('A'), report_in[1], 0xFF77)
-        self.portal_hid.send_report(report_out, self.REPORT_ID)
-        #self.__status() # proactively send status
+        struct.pack_into('>BBH28x', self.report_out, 0, ord('A'), report_in[1], 0xFF77)
+        self.transport.send(self.report_out)
+        self.next_status_ns = 0 # with status_interval_ms, the first status report follows right away
 
     def __query(self, report_in: bytes):
         slot = report_in[1] % 0x10
         block = report_in[2]
-        data = self.slots[slot].toy.read_block(block)
-        report_out = struct.pack('>b2s16s13x', ord('Q'), report_in[1:3], data)
-        self.portal_hid.send_report(report_out, self.REPORT_ID)
+        struct.pack_into('>BBB29x', self.report_out, 0, ord('Q'), report_in[1], block)
+        data = self.slots.toys[slot].read_block(block)
+        self.report_out[3:3 + len(data)] = data
+        self.transport.send(self.report_out)
 
     def __write(self, report_in: bytes):
         slot = report_in[1] % 0x10
         block = report_in[2]
-        data = report_in[3:19]
-        self.slots[slot].toy.write_block(block, data)
-        self.slots[slot].toy.needs_saving = True
-        report_out = struct.pack('>b2s29x', ord('W'), report_in[1:3])
-        self.portal_hid.send_report(report_out, self.REPORT_ID)
+        toy = self.slots.toys[slot]
+        toy.write_block(block, memoryview(report_in)[3:19])
+        toy.needs_saving = True
+        self.slots.dirty.add(slot)
+        struct.pack_into('>BBB29x', self.report_out, 0, ord('W'), report_in[1], block)
+        self.transport.send(self.report_out)
 
     def __init_slots(self):
-        self.slots = []
-        for index in range(self.MAX_TOYS):
-            self.slots.append(Slot())
+        self.slots = SlotTable(self.slot_count)
+        for index in range(self.slot_count):
             self.update_slot(index, Slot.STATUS_ADDED)
 
+    def __save_toy(self, index: int):
+        self.slots.dirty.discard(index)
+        toy = self.slots.toys[index]
+        if (toy is None or not toy.needs_saving):
+            return
+        try:
+            toy.save()
+        except OSError as error:
+            # the toy keeps needs_saving, it's saved again when it's written or removed
+            self.save_failures += 1
+            self.save_error = "{}: {}".format(toy.path, error)
+            return
+        toy.needs_saving = False
+
     def __save_toys(self):
-        for index in range(self.MAX_TOYS):
-            if (self.slots[index].toy.needs_saving):
-                self.slots[index].toy.save()
-                self.slots[index].toy.needs_saving = False
+        while (self.slots.dirty):
+            self.__save_toy(next(iter(self.slots.dirty)))
 
     @staticmethod
-    def get_hid_device() -> usb_hid.Device:
+    def get_hid_device() -> "usb_hid.Device":
         """Create a USB HID Portal device
         """
         return usb_hid.Device(
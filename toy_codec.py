@@ -0,0 +1,211 @@
+try:
+    from typing import List, Optional
+except ImportError:
+    pass
+
+import struct
+
+try:
+    import hashlib
+except ImportError:
+    hashlib = None
+
+try:
+    import aesio # CircuitPython
+except ImportError:
+    aesio = None
+
+try:
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes # CPython
+except ImportError:
+    Cipher = None
+
+BLOCK_SIZE = 0x10
+HEADER_BLOCKS = 0x08
+AREA_BLOCKS = (0x08, 0x24)
+KEY_SUFFIX = b" Copyright (C) 2010 Activision. All Rights Reserved. "
+
+def crc16(data, crc: int = 0xFFFF) -> int:
+    """CRC-16/CCITT-FALSE as used for the toy checksums
+    """
+    for byte in data:
+        crc ^= byte << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else crc << 1
+        crc &= 0xFFFF
+    return crc
+
+def is_encrypted(index: int) -> bool:
+    """Data blocks are encrypted, the header and the sector trailers are not
+    """
+    return index >= HEADER_BLOCKS and (index + 1) % 4 != 0
+
+def header_valid(header) -> bool:
+    """Check the checksum over the first two blocks of a dump
+    """
+    return crc16(header[0:0x1E]) == struct.unpack_from('<H', header, 0x1E)[0]
+
+def _md5(data: bytes = b""):
+    if hashlib is not None and hasattr(hashlib, "md5"):
+        return hashlib.md5(data)
+    import adafruit_hashlib # pylint: disable=import-outside-toplevel
+    return adafruit_hashlib.md5(data)
+
+def _decrypt_block(key: bytes, block, out: bytearray):
+    if aesio is not None:
+        aesio.AES(key, aesio.MODE_ECB).decrypt_into(bytes(block), out)
+    elif Cipher is not None:
+        out[:] = Cipher(algorithms.AES(key), modes.ECB()).decryptor().update(bytes(block))
+    else:
+        raise RuntimeError("No AES implementation available (aesio or cryptography)")
+
+class ToyCodec:
+    """Decodes and verifies the data blocks of a `portal.Toy`
+
+    The MD5 state over the toy header is computed once and the per block keys and
+    decrypted blocks are memoized. The codec registers itself as an observer of the
+    toy, so `Toy.write_block` only invalidates the blocks it touches; writing the
+    header invalidates everything.
+    """
+
+    __slots__ = ("toy", "_header_md5", "_keys", "_plain")
+
+    def __init__(self, toy):
+        self.toy = toy
+        self._header_md5 = None
+        self._keys = {}
+        self._plain = [None] * (len(toy.data) // BLOCK_SIZE)
+        toy.observers.append(self)
+
+    def close(self):
+        """Stop observing the toy.
+        """
+        self.toy.observers.remove(self)
+
+    def block_changing(self, index: int):
+        if index < 2:
+            self._header_md5 = None
+            self._keys.clear()
+            for cached in range(len(self._plain)):
+                self._plain[cached] = None
+        elif index < len(self._plain):
+            self._plain[index] = None
+
+    def toy_saving(self):
+        pass
+
+    def block_key(self, index: int) -> bytes:
+        """The AES key of a data block, derived from the toy header and the block index.
+        """
+        key = self._keys.get(index)
+        if key is None:
+            if self._header_md5 is None:
+                self._header_md5 = _md5(bytes(self.toy.data[0:2 * BLOCK_SIZE]))
+            if hasattr(self._header_md5, "copy"):
+                md5 = self._header_md5.copy()
+            else:
+                md5 = _md5(bytes(self.toy.data[0:2 * BLOCK_SIZE]))
+            md5.update(bytes((index,)))
+            md5.update(KEY_SUFFIX)
+            key = md5.digest()
+            self._keys[index] = key
+        return key
+
+    def decoded_block(self, index: int) -> bytes:
+        """The plain text of a block, decrypting it only if it isn't cached.
+        """
+        plain = self._plain[index]
+        if plain is None:
+            block = self.toy.read_block(index)
+            if is_encrypted(index) and any(block):
+                plain = bytearray(BLOCK_SIZE)
+                _decrypt_block(self.block_key(index), block, plain)
+                plain = bytes(plain)
+            else:
+                plain = bytes(block)
+            self._plain[index] = plain
+        return plain
+
+    def decode_all(self) -> List[bytes]:
+        """Decode every block of the toy in one pass, returns the plain text blocks.
+        """
+        return [self.decoded_block(index) for index in range(len(self._plain))]
+
+    def verify(self) -> List[str]:
+        """Check the header checksum and the checksum of each data area.
+
+        Returns the names of the failing checks, an empty list means the toy is valid.
+        """
+        failures = []
+        if not header_valid(self.toy.data[0:2 * BLOCK_SIZE]):
+            failures.append("header")
+        for area, block in enumerate(AREA_BLOCKS):
+            if block >= len(self._plain):
+                continue
+            plain = self.decoded_block(block)
+            if not any(plain):
+                continue # never written
+            if crc16(plain[0:0x0E] + b"\x05\x00") != struct.unpack_from('<H', plain, 0x0E)[0]:
+                failures.append("area {}".format(area))
+        return failures
+
+    def active_area(self) -> Optional[int]:
+        """Index of the data area the game wrote last, None for a blank toy.
+        """
+        sequences = []
+        for block in AREA_BLOCKS:
+            plain = self.decoded_block(block) if block < len(self._plain) else bytes(BLOCK_SIZE)
+            sequences.append(plain[0x09] if any(plain) else None)
+        if sequences[0] is None and sequences[1] is None:
+            return None
+        if sequences[1] is None:
+            return 0
+        if sequences[0] is None:
+            return 1
+        return 1 if (sequences[1] - sequences[0]) & 0xFF < 0x80 else 0
+
+    @property
+    def figure_id(self) -> int:
+        return struct.unpack_from('<H', self.toy.data, 0x10)[0]
+
+    @property
+    def variant(self) -> int:
+        return struct.unpack_from('<H', self.toy.data, 0x1C)[0]
+
+    def __area_block(self, offset: int) -> bytes:
+        area = self.active_area()
+        if area is None:
+            return bytes(BLOCK_SIZE)
+        return self.decoded_block(AREA_BLOCKS[area] + offset)
+
+    @property
+    def xp(self) -> int:
+        block = self.__area_block(0)
+        return block[0] | block[1] << 8 | block[2] << 16
+
+    @property
+    def gold(self) -> int:
+        return struct.unpack_from('<H', self.__area_block(0), 0x03)[0]
+
+    @property
+    def nickname(self) -> str:
+        raw = self.__area_block(2) + self.__area_block(4)
+        chars = []
+        for offset in range(0, len(raw), 2):
+            char = raw[offset] | raw[offset + 1] << 8 # UTF-16-LE, no surrogates in names
+            if char == 0:
+                break
+            chars.append(chr(char))
+        return "".join(chars)
+
+    def summary(self) -> dict:
+        """Decoded state for listings, e.g. as JSON from the web UI.
+        """
+        return {
+            "figure_id": self.figure_id,
+            "variant": self.variant,
+            "xp": self.xp,
+            "gold": self.gold,
+            "nickname": self.nickname,
+            "valid": not self.verify(),
+        }
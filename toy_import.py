@@ -0,0 +1,455 @@
+try:
+    from typing import List, Optional, Tuple
+except ImportError:
+    pass
+
+import struct
+
+try:
+    import zlib
+except ImportError:
+    zlib = None
+
+try:
+    from zlib import crc32
+except ImportError:
+    try:
+        from binascii import crc32
+    except ImportError:
+        crc32 = None
+
+from toy_codec import header_valid
+
+DUMP_SIZE = 1024
+
+_ZIP_LOCAL = b"PK\x03\x04"
+_ZIP_CENTRAL = b"PK\x01\x02"
+_ZIP_END = b"PK\x05\x06"
+_ZIP_DESCRIPTOR = b"PK\x07\x08"
+_ZIP_HEADER_LIMIT = 1024 # local header with name and extra field
+_TAR_BLOCK = 512
+_TAR_META_LIMIT = 1024 # pax extended header or GNU long name
+_INFLATE_STEP = 256 # decompressed bytes per step, so oversized entries stay bounded
+
+_DETECT = 0
+_TAR_HEADER = 1
+_ZIP_HEADER = 2
+_DATA = 3
+_INFLATE = 4 # deflated zip entry whose size is only in the data descriptor
+_DESCRIPTOR = 5
+_DONE = 6
+_TAR_META = 7 # data of a pax extended header or GNU long name, for the next entry
+
+class DumpDirectory:
+    """Library of ``<name>.dump`` files in a directory, e.g. the toy directory
+    """
+
+    def __init__(self, path: str = "/"):
+        self.path = path.rstrip("/")
+
+    def save_toy(self, name: str, data: bytes):
+        with open("{}/{}.dump".format(self.path, name), 'wb') as fp:
+            fp.write(data)
+
+class ToyImporter:
+    """Imports the toy dumps of a tar or zip archive that is fed in chunks of any size
+
+    Only a header or a single dump is held at a time, never the archive, so a pack can
+    be imported as it arrives over the network. ``*.dump`` entries are checked for
+    size, CRC (zip) and header checksum, valid ones are handed to
+    ``library.save_toy(name, data)`` one by one, e.g. a `DumpDirectory` or a
+    `block_store.BlockStore`. Deflated zip entries need ``zlib.decompressobj``.
+    """
+
+    def __init__(self, library, dump_size: int = DUMP_SIZE):
+        self.library = library
+        self.dump_size = dump_size
+        self.imported = [] # names
+        self.rejected = [] # (name, reason)
+        self.skipped = 0 # entries that aren't dumps
+        self.__dump = bytearray(dump_size)
+        self.__header = bytearray()
+        self.__state = _DETECT
+        self.__need = 4
+        self.__zip = False
+        self.__skip = 0
+        self.__remaining = 0
+        self.__padding = 0
+        self.__descriptor = False
+        self.__long_name = None
+        self.__meta_type = 0
+        self.__name = None
+        self.__reason = None
+        self.__length = 0
+        self.__crc = None
+        self.__inflater = None
+
+    def feed(self, data):
+        """Process the next chunk of the archive.
+        """
+        view = memoryview(data)
+        while (len(view) and self.__state != _DONE):
+            if (self.__skip):
+                count = min(self.__skip, len(view))
+                self.__skip -= count
+                view = view[count:]
+            elif (self.__state == _DATA):
+                count = min(self.__remaining, len(view))
+                self.__entry_data(view[:count])
+                self.__remaining -= count
+                view = view[count:]
+                if (not self.__remaining):
+                    self.__data_end()
+            elif (self.__state == _INFLATE):
+                view = self.__inflate_until_end(view)
+            else:
+                count = min(self.__need - len(self.__header), len(view))
+                self.__header += view[:count]
+                view = view[count:]
+                if (len(self.__header) == self.__need):
+                    self.__parse_header()
+
+    def close(self) -> dict:
+        """Finish the import, returns what was imported and rejected.
+        """
+        header = bytes(self.__header[0:4])
+        complete = (self.__state == _DONE
+                    or (not self.__skip and not self.__header and self.__state in (_DETECT, _TAR_HEADER, _ZIP_HEADER))
+                    or (self.__state == _ZIP_HEADER and header in (_ZIP_CENTRAL, _ZIP_END)))
+        if (not complete and self.__name is not None):
+            self.rejected.append((self.__name, "truncated"))
+            self.__name = None
+        return {
+            "imported": self.imported,
+            "rejected": [{"name": name, "reason": reason} for name, reason in self.rejected],
+            "skipped": self.skipped,
+            "complete": complete,
+        }
+
+    def __parse_header(self):
+        if (self.__state == _DETECT):
+            signature = bytes(self.__header)
+            if (signature == _ZIP_END):
+                self.__state = _DONE # empty zip
+            elif (signature == _ZIP_LOCAL):
+                self.__zip = True
+                self.__state = _ZIP_HEADER
+                self.__need = 30
+            else:
+                self.__state = _TAR_HEADER
+                self.__need = _TAR_BLOCK
+        elif (self.__state == _TAR_HEADER):
+            self.__parse_tar_header()
+        elif (self.__state == _TAR_META):
+            self.__parse_tar_meta()
+        elif (self.__state == _ZIP_HEADER):
+            self.__parse_zip_header()
+        elif (self.__state == _DESCRIPTOR):
+            self.__parse_descriptor()
+
+    def __parse_tar_header(self):
+        block = self.__header
+        self.__header = bytearray()
+        if (not any(block)):
+            self.__state = _DONE # end of archive
+            return
+        checksum = _tar_number(block[148:156])
+        if (checksum is None or checksum != sum(block[0:148]) + 8 * 0x20 + sum(block[156:_TAR_BLOCK])):
+            raise ValueError("Not a tar or zip archive")
+        name = _tar_string(block[0:100])
+        if (block[257:262] == b"ustar"):
+            prefix = _tar_string(block[345:500])
+            if (prefix):
+                name = prefix + "/" + name
+        size = _tar_number(block[124:136])
+        if (size is None):
+            raise ValueError("Unsupported tar entry size")
+        padding = -size % _TAR_BLOCK
+        kind = block[156]
+        if (kind in (ord('x'), ord('L'))): # the long name of the next entry
+            if (size > _TAR_META_LIMIT):
+                raise ValueError("Tar extended header too long")
+            self.__meta_type = kind
+            self.__padding = padding
+            self.__state = _TAR_META
+            self.__need = size
+            if (not size):
+                self.__parse_tar_meta()
+            return
+        if (self.__long_name is not None):
+            name = self.__long_name
+            self.__long_name = None
+        if (kind in (0, ord('0'), ord('7'))): # regular file
+            self.__padding = padding
+            self.__start_entry(name, size, None)
+            self.__read_data(size)
+        else:
+            self.__skip = size + padding
+
+    def __parse_tar_meta(self):
+        data = bytes(self.__header)
+        self.__header = bytearray()
+        if (self.__meta_type == ord('L')):
+            self.__long_name = _tar_string(data)
+        else:
+            path = _pax_path(data)
+            if (path is not None):
+                self.__long_name = path
+        self.__skip = self.__padding
+        self.__state = _TAR_HEADER
+        self.__need = _TAR_BLOCK
+
+    def __parse_zip_header(self):
+        header = self.__header
+        signature = bytes(header[0:4])
+        if (signature in (_ZIP_CENTRAL, _ZIP_END)):
+            self.__state = _DONE # the central directory repeats what came before
+            return
+        if (signature != _ZIP_LOCAL):
+            raise ValueError("Corrupt zip archive")
+        flags, method, crc, compressed, size, name_length, extra_length = struct.unpack_from('<2xHH4xIIIHH', header, 4)
+        total = 30 + name_length + extra_length
+        if (len(header) < total):
+            if (total > _ZIP_HEADER_LIMIT):
+                raise ValueError("Zip entry header too long")
+            self.__need = total
+            return
+        try:
+            name = bytes(header[30:30 + name_length]).decode()
+        except UnicodeError:
+            name = ""
+        self.__header = bytearray()
+        self.__need = 30
+        if (compressed == 0xFFFFFFFF or size == 0xFFFFFFFF):
+            raise ValueError("Zip64 archives are not supported")
+        self.__descriptor = bool(flags & 0x08)
+        unknown_size = self.__descriptor and not compressed
+        if (unknown_size and method != 8):
+            raise ValueError("Zip entries without sizes can only be streamed when deflated")
+        if (unknown_size and (flags & 0x01 or not _can_inflate())):
+            raise ValueError("Can't find the end of an encrypted or deflated zip entry")
+        self.__start_entry(name, None if unknown_size else size, None if self.__descriptor else crc)
+        if (flags & 0x01):
+            self.__reject("encrypted")
+        if (method == 8 and _can_inflate()):
+            self.__inflater = zlib.decompressobj(-15)
+        elif (method != 0):
+            self.__reject("compression")
+        if (unknown_size):
+            self.__state = _INFLATE
+        else:
+            self.__read_data(compressed)
+
+    def __parse_descriptor(self):
+        if (len(self.__header) == 4):
+            self.__need = 16 if bytes(self.__header) == _ZIP_DESCRIPTOR else 12 # the signature is optional
+            return
+        self.__crc = struct.unpack_from('<I', self.__header, len(self.__header) - 12)[0]
+        self.__header = bytearray()
+        self.__finish_entry()
+        self.__state = _ZIP_HEADER
+        self.__need = 30
+
+    def __start_entry(self, name: str, size: Optional[int], crc: Optional[int]):
+        """Set up for an entry of ``size`` bytes, None if unknown.
+        """
+        base = name.replace("\\", "/").rsplit("/", 1)[-1]
+        self.__name = None
+        self.__reason = None
+        self.__length = 0
+        self.__crc = crc
+        self.__inflater = None
+        if (not base.lower().endswith(".dump") or base.startswith(".")):
+            self.skipped += 1 # a directory, readme or other file
+        else:
+            self.__name = base[:-5]
+            if (not self.__name):
+                self.__reject("name")
+            elif (size is not None and size != self.dump_size):
+                self.__reject("size")
+
+    def __read_data(self, stored: int):
+        """Continue with the ``stored`` bytes of the entry's data.
+        """
+        self.__state = _DATA
+        self.__remaining = stored
+        if (not stored):
+            self.__data_end()
+
+    def __reject(self, reason: str):
+        if (self.__reason is None):
+            self.__reason = reason
+
+    def __entry_data(self, chunk):
+        if (self.__inflater is not None):
+            if (self.__name is None or self.__reason is not None):
+                if (self.__state == _DATA):
+                    return # the size is known, nothing to decompress
+            data = chunk
+            while True:
+                try:
+                    self.__keep(self.__inflater.decompress(data, _INFLATE_STEP))
+                except Exception: # pylint: disable=broad-except
+                    if (self.__state == _INFLATE):
+                        raise ValueError("Corrupt deflated zip entry")
+                    self.__reject("corrupt") # the rest of its data is skipped
+                    return
+                data = self.__inflater.unconsumed_tail
+                if (not data or self.__inflater.eof):
+                    break
+        elif (self.__name is not None and self.__reason is None):
+            self.__keep(chunk)
+
+    def __keep(self, data):
+        if (self.__name is None or self.__reason is not None or not data):
+            return
+        end = self.__length + len(data)
+        if (end > self.dump_size):
+            self.__reject("size")
+            return
+        self.__dump[self.__length:end] = data
+        self.__length = end
+
+    def __inflate_until_end(self, view) -> memoryview:
+        self.__entry_data(view)
+        if (not self.__inflater.eof):
+            return view[len(view):]
+        rest = self.__inflater.unused_data
+        self.__state = _DESCRIPTOR
+        self.__need = 4
+        return memoryview(rest)
+
+    def __data_end(self):
+        if (self.__inflater is not None and self.__state == _DATA):
+            if (self.__name is not None and self.__reason is None):
+                self.__keep(self.__inflater.flush())
+                if (not self.__inflater.eof):
+                    self.__reject("truncated")
+        if (not self.__zip):
+            self.__skip = self.__padding
+            self.__finish_entry()
+            self.__state = _TAR_HEADER
+            self.__need = _TAR_BLOCK
+        elif (self.__descriptor):
+            self.__state = _DESCRIPTOR
+            self.__need = 4
+        else:
+            self.__finish_entry()
+            self.__state = _ZIP_HEADER
+            self.__need = 30
+
+    def __finish_entry(self):
+        name = self.__name
+        self.__name = None
+        self.__inflater = None
+        if (name is None):
+            return
+        dump = self.__dump
+        reason = self.__reason
+        if (reason is None and self.__length != self.dump_size):
+            reason = "size"
+        if (reason is None and self.__crc is not None and crc32 is not None
+                and crc32(dump) & 0xFFFFFFFF != self.__crc):
+            reason = "crc"
+        if (reason is None and not header_valid(dump)):
+            reason = "header"
+        if (reason is not None):
+            self.rejected.append((name, reason))
+            return
+        self.library.save_toy(name, dump)
+        self.imported.append(name)
+
+def _can_inflate() -> bool:
+    return zlib is not None and hasattr(zlib, "decompressobj")
+
+def _tar_string(field) -> str:
+    end = 0
+    while end < len(field) and field[end]:
+        end += 1
+    try:
+        return bytes(field[0:end]).decode()
+    except UnicodeError:
+        return ""
+
+def _pax_path(data: bytes) -> Optional[str]:
+    """The path of pax extended header records ``"<length> <key>=<value>\\n"``, if any
+    """
+    path = None
+    position = 0
+    while position < len(data):
+        space = data.find(b" ", position)
+        try:
+            length = int(data[position:space]) if space > position else 0
+        except ValueError:
+            length = 0
+        if (space < 0 or length <= space - position or position + length > len(data)):
+            raise ValueError("Corrupt pax extended header")
+        key, _, value = data[space + 1:position + length - 1].partition(b"=")
+        if (key == b"path"):
+            try:
+                path = value.decode()
+            except UnicodeError:
+                path = ""
+        position += length
+    return path
+
+def _tar_number(field) -> Optional[int]:
+    text = _tar_string(field).strip()
+    try:
+        return int(text, 8) if text else 0
+    except ValueError:
+        return None
+
+def import_file(importer: ToyImporter, fp, chunk_size: int = 512) -> dict:
+    """Feed an open archive to ``importer`` a chunk at a time.
+    """
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    while True:
+        length = fp.readinto(buffer)
+        if (not length):
+            break
+        importer.feed(view[:length])
+    return importer.close()
+
+def main(argv: List[str]) -> int:
+    """Import an archive into a toy directory or block store, or upload it to a portal.
+    """
+    import argparse # pylint: disable=import-outside-toplevel
+    import json # pylint: disable=import-outside-toplevel
+    import os # pylint: disable=import-outside-toplevel
+    import sys # pylint: disable=import-outside-toplevel
+    parser = argparse.ArgumentParser(description=main.__doc__.splitlines()[0])
+    parser.add_argument("archive", help="tar or zip of .dump files, - for stdin")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--dir", help="toy directory to write .dump files to")
+    target.add_argument("--store", help="block store directory, see block_store.py")
+    target.add_argument("--url", help="a portal's import endpoint, e.g. http://192.168.1.20/import")
+    args = parser.parse_args(argv)
+    if (args.url and args.archive == "-"):
+        parser.error("--url needs an archive file, its size is sent first")
+
+    if (args.url):
+        import urllib.request # pylint: disable=import-outside-toplevel
+        with open(args.archive, 'rb') as fp:
+            request = urllib.request.Request(args.url, data=fp, method="POST", headers={
+                "Content-Length": str(os.fstat(fp.fileno()).st_size),
+                "Content-Type": "application/octet-stream",
+            })
+            with urllib.request.urlopen(request) as response:
+                result = json.load(response)
+    else:
+        if (args.store):
+            from block_store import BlockStore # pylint: disable=import-outside-toplevel
+            library = BlockStore(args.store)
+        else:
+            library = DumpDirectory(args.dir)
+        fp = sys.stdin.buffer if args.archive == "-" else open(args.archive, 'rb')
+        with fp:
+            result = import_file(ToyImporter(library), fp, 4096)
+    print(json.dumps(result, indent=2))
+    return 0 if result["complete"] and not result["rejected"] else 1
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,285 @@
+try:
+    from typing import Dict, List
+except ImportError:
+    pass
+
+import struct
+
+BLOCK_SIZE = 0x10
+MAGIC = b"SNP1"
+# records appended after the snapshots, see SnapshotStore
+_RECORD_BLOCK = b"B"
+_RECORD_TAKE = b"T"
+_RECORD_DELETE = b"D"
+
+class SnapshotStore:
+    """Copy-on-write, block level snapshots of a `portal.Toy`
+
+    A snapshot starts out empty and shares every block with the live image. The first
+    time a block is overwritten afterwards, its old contents are copied into every
+    snapshot that doesn't have that block yet, so a snapshot only ever holds the blocks
+    that changed since it was taken. Snapshots waiting for the same block share the
+    same copy, in memory and in the ``.snap`` file next to the dump.
+
+    `save` writes the whole file. Before the toy is saved, only what happened since
+    is appended to it as records: a snapshot taken or deleted, or a block copied.
+    The file is written whole again once the records outgrow the dump.
+    """
+
+    __slots__ = ("toy", "path", "max_snapshots", "sequence", "order", "deltas", "changed",
+                 "_covered", "_log", "_log_size", "_saved")
+
+    def __init__(self, toy, max_snapshots: int = 8):
+        self.toy = toy
+        self.path = toy.path + ".snap"
+        self.max_snapshots = max_snapshots
+        self.sequence = 0
+        self.order = [] # oldest first
+        self.deltas = {} # name -> {block index: old block}
+        self.changed = False
+        # Snapshots missing a block are always the newest ones, _covered[index] is the
+        # number of snapshots (from the oldest) that already hold their copy of it.
+        self._covered = bytearray(len(toy.data) // BLOCK_SIZE)
+        self._log = [] # records not in the file yet
+        self._log_size = 0 # bytes of records in the file after the last full save
+        self._saved = False # whether the file holds the state before _log
+        self.load()
+        toy.observers.append(self)
+
+    def close(self):
+        """Stop observing the toy.
+        """
+        self.toy.observers.remove(self)
+
+    def block_changing(self, index: int):
+        covered = self._covered[index]
+        if covered == len(self.order):
+            return
+        old = bytes(self.toy.read_block(index))
+        self.__copy_block(index, covered, old)
+        self._log.append(_RECORD_BLOCK + struct.pack('<BB', index, covered) + old)
+        self.changed = True
+
+    def toy_saving(self):
+        # the old blocks have to be on flash before the dump is overwritten
+        if self.changed:
+            self.__append()
+
+    def take(self, name: str = None, prefix: str = "snapshot") -> str:
+        """Take a snapshot of the current state, returns its name.
+
+        Unnamed snapshots are numbered, e.g. ``snapshot-3``. The oldest snapshot is
+        dropped when there are more than ``max_snapshots``.
+        """
+        if name is None:
+            self.sequence += 1
+            name = "{}-{}".format(prefix, self.sequence)
+        if name in self.deltas:
+            self.delete(name)
+        self.__add(name)
+        encoded = name.encode("utf-8")
+        self._log.append(_RECORD_TAKE + struct.pack('<HB', self.sequence & 0xFFFF, len(encoded)) + encoded)
+        self.changed = True
+        while len(self.order) > self.max_snapshots:
+            self.delete(self.order[0])
+        return name
+
+    def delete(self, name: str):
+        self.__remove(name)
+        encoded = name.encode("utf-8")
+        self._log.append(_RECORD_DELETE + struct.pack('<B', len(encoded)) + encoded)
+        self.changed = True
+
+    def names(self) -> List[str]:
+        """Snapshot names, oldest first.
+        """
+        return list(self.order)
+
+    def diff(self, name: str) -> List[int]:
+        """Indices of the blocks that differ between the snapshot and the live image.
+        """
+        return sorted(index for index, block in self.deltas[name].items()
+                      if block != bytes(self.toy.read_block(index)))
+
+    def restore(self, name: str) -> int:
+        """Roll the live image back to the snapshot, returns the number of blocks written.
+
+        The toy is marked as needing saving, newer snapshots keep their own state. Toys in
+        a portal slot are restored with `portal.Portal.restore_snapshot`, which also has
+        the slot saved.
+        """
+        written = 0
+        for index in self.diff(name):
+            self.toy.write_block(index, self.deltas[name][index])
+            written += 1
+        if written:
+            self.toy.needs_saving = True
+        return written
+
+    def save(self):
+        """Write all snapshots to the ``.snap`` file, shared blocks are stored once.
+        """
+        pool = []
+        refs = {}
+        for name in self.order:
+            for block in self.deltas[name].values():
+                if block not in refs:
+                    refs[block] = len(pool)
+                    pool.append(block)
+        with open(self.path, 'wb') as fp:
+            fp.write(MAGIC)
+            fp.write(struct.pack('<HHB', self.sequence & 0xFFFF, len(pool), len(self.order)))
+            for block in pool:
+                fp.write(block)
+            for name in self.order:
+                encoded = name.encode("utf-8")
+                delta = self.deltas[name]
+                fp.write(struct.pack('<B', len(encoded)))
+                fp.write(encoded)
+                fp.write(struct.pack('<H', len(delta)))
+                for index, block in delta.items():
+                    fp.write(struct.pack('<BH', index, refs[block]))
+        self._log = []
+        self._log_size = 0
+        self._saved = True
+        self.changed = False
+
+    def load(self):
+        """Read the snapshots from the ``.snap`` file, if there is one.
+
+        A file that doesn't match the toy, e.g. a block index past its end, is
+        discarded and written anew with the next save.
+        """
+        try:
+            with open(self.path, 'rb') as fp:
+                data = fp.read()
+        except OSError:
+            return
+        try:
+            self.__parse(data)
+        except (ValueError, EOFError):
+            self.sequence = 0
+            self.order = []
+            self.deltas = {}
+            self._covered = bytearray(len(self._covered))
+            self._saved = False
+            self.changed = True
+
+    def __append(self):
+        size = 0
+        for record in self._log:
+            size += len(record)
+        if not self._saved or self._log_size + size > len(self.toy.data):
+            self.save()
+            return
+        with open(self.path, 'ab') as fp:
+            for record in self._log:
+                fp.write(record)
+        self._log = []
+        self._log_size += size
+        self.changed = False
+
+    def __parse(self, data: bytes):
+        reader = _Reader(data)
+        if reader.take(4) != MAGIC:
+            raise ValueError("Not a snapshot file: " + self.path)
+        self.sequence, pool_size, count = struct.unpack('<HHB', reader.take(5))
+        pool = []
+        for _ in range(pool_size):
+            pool.append(bytes(reader.take(BLOCK_SIZE)))
+        self.order = []
+        self.deltas = {}
+        for position in range(count):
+            name = reader.name()
+            if name in self.deltas:
+                raise ValueError("Snapshot {} is in {} twice".format(name, self.path))
+            (blocks,) = struct.unpack('<H', reader.take(2))
+            delta = {}
+            for _ in range(blocks):
+                index, ref = struct.unpack('<BH', reader.take(3))
+                if index >= len(self._covered) or ref >= pool_size:
+                    raise ValueError("Bad block in " + self.path)
+                delta[index] = pool[ref]
+                self._covered[index] = max(self._covered[index], position + 1)
+            self.order.append(name)
+            self.deltas[name] = delta
+        self._log_size = 0
+        self._saved = True
+        # the records appended since, a torn one at the end is dropped with the rest of the file
+        while reader.remaining():
+            start = reader.offset
+            try:
+                self.__replay(reader)
+            except EOFError:
+                self._saved = False # the next save writes the whole file
+                break
+            self._log_size += reader.offset - start
+
+    def __replay(self, reader: "_Reader"):
+        kind = reader.take(1)
+        if kind == _RECORD_BLOCK:
+            index, covered = struct.unpack('<BB', reader.take(2))
+            old = bytes(reader.take(BLOCK_SIZE))
+            if index >= len(self._covered) or covered > len(self.order):
+                raise ValueError("Bad block in " + self.path)
+            if covered < len(self.order):
+                self.__copy_block(index, covered, old)
+        elif kind == _RECORD_TAKE:
+            sequence, length = struct.unpack('<HB', reader.take(3))
+            name = reader.text(length)
+            if name in self.deltas:
+                raise ValueError("Snapshot {} is in {} twice".format(name, self.path))
+            self.sequence = sequence
+            self.__add(name)
+        elif kind == _RECORD_DELETE:
+            name = reader.name()
+            if name not in self.deltas:
+                raise ValueError("No snapshot {} in {}".format(name, self.path))
+            self.__remove(name)
+        else:
+            raise ValueError("Bad record in " + self.path)
+
+    def __copy_block(self, index: int, covered: int, old: bytes):
+        for name in self.order[covered:]:
+            self.deltas[name][index] = old
+        self._covered[index] = len(self.order)
+
+    def __add(self, name: str):
+        self.order.append(name)
+        self.deltas[name] = {}
+
+    def __remove(self, name: str):
+        position = self.order.index(name)
+        self.order.pop(position)
+        del self.deltas[name]
+        for index, covered in enumerate(self._covered):
+            if covered > position:
+                self._covered[index] = covered - 1
+
+class _Reader:
+    """Reads the parts of a snapshot file, raising EOFError where it ends early
+    """
+
+    __slots__ = ("data", "offset")
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.offset = 0
+
+    def remaining(self) -> int:
+        return len(self.data) - self.offset
+
+    def take(self, length: int) -> bytes:
+        if self.offset + length > len(self.data):
+            raise EOFError()
+        self.offset += length
+        return self.data[self.offset - length:self.offset]
+
+    def text(self, length: int) -> str:
+        try:
+            return self.take(length).decode("utf-8")
+        except UnicodeError:
+            raise ValueError("Bad snapshot name") from None
+
+    def name(self) -> str:
+        return self.text(self.take(1)[0])
@@ -0,0 +1,189 @@
+try:
+    from typing import Optional, Protocol, Sequence, Union
+except ImportError:
+    pass
+
+from errno import EAGAIN
+
+class HIDTransport:
+    """Exchanges Portal reports with the console over USB HID
+    """
+
+    def __init__(self, devices: Sequence["usb_hid.Device"], usage_page: int, usage: int, report_id: int) -> None:
+        self.device = self.__find_device(devices, usage_page, usage)
+        self.report_id = report_id
+
+    def __find_device(self, devices: Sequence["usb_hid.Device"], usage_page: int, usage: int) -> "usb_hid.Device":
+        """Search through the provided sequence of devices to find the USB HID Portal device.
+        """
+        if hasattr(devices, "send_report"):
+            devices = [devices]  # type: ignore
+        for device in devices:
+            if (device.usage_page == usage_page and device.usage == usage and hasattr(device, "send_report")):
+                return device
+        raise ValueError("Could not find matching HID device.")
+
+    def receive(self) -> Optional[bytes]:
+        """Returns the next report from the console or None.
+        """
+        return self.device.get_last_received_report()
+
+    def send(self, report: bytes):
+        self.device.send_report(report, self.report_id)
+
+    def flush(self):
+        pass
+
+class NetworkTransport:
+    """Exchanges Portal reports with an emulator over TCP or UDP
+
+    The emulator sends the same fixed size frames the console sends over HID, several
+    frames may share one packet. Frames sent between two `flush` calls are batched
+    into one packet as well. Over UDP, frames queued for one emulator are flushed
+    before a packet from another one is taken, so replies go back to their sender.
+    """
+
+    TCP = "tcp"
+    UDP = "udp"
+
+    def __init__(self, socket_source: Protocol, host: str, port: int, protocol: str = UDP,
+                 low_latency: bool = False, report_length: int = 32, batch_size: int = 16) -> None:
+        """Listen for an emulator at the given host and port.
+
+        :param socket_source: `socketpool` in CircuitPython or the `socket` module in CPython
+        :param str protocol: `NetworkTransport.UDP` or `NetworkTransport.TCP`
+        :param bool low_latency: disable Nagle's algorithm on TCP connections
+        :param int batch_size: maximum number of frames per packet
+        """
+        if protocol not in (NetworkTransport.TCP, NetworkTransport.UDP):
+            raise ValueError("protocol must be NetworkTransport.TCP or NetworkTransport.UDP")
+        self.socket_source = socket_source
+        self.protocol = protocol
+        self.low_latency = low_latency
+        self.report_length = report_length
+        self.peer = None
+        self.conn = None
+        self._in = bytearray(report_length * batch_size)
+        self._in_view = memoryview(self._in)
+        self._in_start = 0
+        self._in_end = 0
+        self._out = bytearray(report_length * batch_size)
+        self._out_view = memoryview(self._out)
+        self._out_end = 0
+
+        kind = socket_source.SOCK_DGRAM if protocol == NetworkTransport.UDP else socket_source.SOCK_STREAM
+        self.sock = socket_source.socket(socket_source.AF_INET, kind)
+        self.sock.bind((host, port))
+        if protocol == NetworkTransport.TCP:
+            self.sock.listen(1)
+        self.sock.setblocking(False)
+        self.port = self.sock.getsockname()[1] if hasattr(self.sock, "getsockname") else port
+
+    def receive(self) -> Optional[memoryview]:
+        """Returns the next frame from the emulator or None.
+
+        The frame is a view into the receive buffer, it is only valid until the next call.
+        """
+        if self._in_end - self._in_start < self.report_length:
+            if self.protocol == NetworkTransport.UDP:
+                self.__fill_datagram()
+            else:
+                if self._out_end:
+                    self.flush() # what the connection didn't take the last time
+                self.__fill_stream()
+            if self._in_end - self._in_start < self.report_length:
+                return None
+        start = self._in_start
+        self._in_start += self.report_length
+        return self._in_view[start:self._in_start]
+
+    def send(self, report: Union[bytes, bytearray, memoryview]):
+        """Queue a frame for the emulator, it is sent with the next `flush`.
+        """
+        if self.peer is None and self.conn is None:
+            return  # nobody to talk to
+        if self._out_end + len(report) > len(self._out):
+            self.flush()
+            if self._out_end + len(report) > len(self._out):
+                self.__disconnect() # the emulator stopped reading
+                return
+        self._out_view[self._out_end:self._out_end + len(report)] = report
+        self._out_end += len(report)
+
+    def flush(self):
+        """Send all queued frames in one packet.
+
+        Over TCP, what the connection doesn't take without blocking stays queued for
+        the next `flush` or `receive`.
+        """
+        if self._out_end == 0:
+            return
+        if self.protocol == NetworkTransport.UDP:
+            try:
+                self.sock.sendto(self._out_view[:self._out_end], self.peer)
+            except OSError:
+                self.__disconnect()
+            self._out_end = 0
+            return
+        sent = 0
+        try:
+            while sent < self._out_end:
+                sent += self.conn.send(self._out_view[sent:self._out_end])
+        except OSError as ex:
+            if ex.errno != EAGAIN:
+                self.__disconnect()
+                return
+        pending = self._out_end - sent
+        if pending:
+            self._out[0:pending] = self._out[sent:self._out_end]
+        self._out_end = pending
+
+    def close(self):
+        self.__disconnect()
+        self.sock.close()
+
+    def __fill_datagram(self):
+        self._in_start = 0
+        self._in_end = 0
+        try:
+            length, peer = self.sock.recvfrom_into(self._in)
+        except OSError:
+            return
+        if peer != self.peer:
+            self.flush() # replies to the previous emulator still go to it
+            self.peer = peer
+        self._in_end = length - length % self.report_length # drop partial frames
+
+    def __fill_stream(self):
+        if self.conn is None:
+            try:
+                self.conn, _ = self.sock.accept()
+            except OSError:
+                return
+            self.conn.setblocking(False)
+            if self.low_latency and hasattr(self.socket_source, "TCP_NODELAY"):
+                self.conn.setsockopt(self.socket_source.IPPROTO_TCP, self.socket_source.TCP_NODELAY, 1)
+        pending = self._in_end - self._in_start
+        if pending:
+            self._in[0:pending] = self._in[self._in_start:self._in_end]
+        self._in_start = 0
+        self._in_end = pending
+        try:
+            length = self.conn.recv_into(self._in_view[pending:], len(self._in) - pending)
+        except OSError as ex:
+            if ex.errno != EAGAIN:
+                self.__disconnect()
+            return
+        if not length:
+            self.__disconnect()
+            return
+        self._in_end += length
+
+    def __disconnect(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+        self.peer = None
+        self._in_start = 0
+        self._in_end = 0
+        self._out_end = 0
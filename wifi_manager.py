@@ -0,0 +1,97 @@
+try:
+    from typing import Callable, Optional
+except ImportError:
+    pass
+
+import time
+
+class WiFiManager:
+    """Brings Wi-Fi up from the main loop, retrying with exponential backoff
+    """
+
+    STATE_IDLE = 0
+    STATE_WAITING = 1
+    STATE_CONNECTED = 2
+
+    def __init__(self, radio, ssid: str, password: str,
+                 on_connect: Optional[Callable[[str], None]] = None,
+                 on_disconnect: Optional[Callable[[], None]] = None,
+                 connect_timeout: float = 3,
+                 initial_backoff: float = 0.5,
+                 max_backoff: float = 60) -> None:
+        """Create a manager for ``radio`` (``wifi.radio``). Nothing happens before `start`.
+
+        ``on_connect`` is called with the IP address every time a connection comes up,
+        ``on_disconnect`` every time it is lost. If ``on_connect`` raises, it's called
+        again after the backoff and `is_connected` stays False until it succeeds.
+        """
+        self.radio = radio
+        self.ssid = ssid
+        self.password = password
+        self.on_connect = on_connect
+        self.on_disconnect = on_disconnect
+        self.connect_timeout = connect_timeout
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.state = WiFiManager.STATE_IDLE
+        self.backoff = initial_backoff
+        self.next_attempt = 0.0
+        self.attempts = 0
+        self.failures = 0
+
+    @property
+    def is_connected(self) -> bool:
+        return self.state == WiFiManager.STATE_CONNECTED
+
+    def start(self, delay: float = 0) -> None:
+        """Schedule the first connection attempt ``delay`` seconds from now.
+
+        Calling it again only ever brings the first attempt forward.
+        """
+        next_attempt = time.monotonic() + delay
+        if self.state == WiFiManager.STATE_IDLE:
+            self.state = WiFiManager.STATE_WAITING
+            self.next_attempt = next_attempt
+        elif self.state == WiFiManager.STATE_WAITING and self.attempts == 0:
+            self.next_attempt = min(self.next_attempt, next_attempt)
+
+    def poll(self) -> None:
+        """Advance the state machine, call once per main loop iteration.
+
+        At most one connection attempt is made per call, it blocks for up to ``connect_timeout``.
+        """
+        if self.state == WiFiManager.STATE_IDLE:
+            return
+        if self.state == WiFiManager.STATE_CONNECTED:
+            if self.radio.ipv4_address is None:
+                self.state = WiFiManager.STATE_WAITING
+                self.backoff = self.initial_backoff
+                self.next_attempt = time.monotonic()
+                if self.on_disconnect is not None:
+                    self.on_disconnect()
+            return
+        if time.monotonic() < self.next_attempt:
+            return
+        if self.radio.ipv4_address is None:
+            self.attempts += 1
+            try:
+                self.radio.connect(self.ssid, self.password, timeout=self.connect_timeout)
+            except Exception: # ConnectionError, or OSError from the driver
+                pass
+            if self.radio.ipv4_address is None:
+                self.__back_off()
+                return
+        # connected only once on_connect worked, e.g. the server could bind, else it's retried
+        try:
+            if self.on_connect is not None:
+                self.on_connect(str(self.radio.ipv4_address))
+        except Exception: # pylint: disable=broad-except
+            self.__back_off()
+            return
+        self.state = WiFiManager.STATE_CONNECTED
+        self.backoff = self.initial_backoff
+
+    def __back_off(self):
+        self.failures += 1
+        self.next_attempt = time.monotonic() + self.backoff
+        self.backoff = min(self.backoff * 2, self.max_backoff)